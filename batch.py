@@ -0,0 +1,143 @@
+import datetime
+import json
+import os
+import queue
+import time
+
+import engine
+from progress import format_eta
+
+
+def _run_job(operation, index, path, output, options, events):
+    last_sent = [0.0]
+
+    def progress(value, text=""):
+        # Worker events cross a process boundary; forward at most ~10 per second per file.
+        now = time.perf_counter()
+        if now - last_sent[0] >= 0.1:
+            last_sent[0] = now
+            events.put((index, value, text))
+
+    started = time.perf_counter()
+    try:
+        result = engine.run_operation(operation, path, progress=progress, output=output, **options)
+        result = {'input': path, 'ok': True, **result}
+    except Exception as e:
+        result = {'input': path, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    result['elapsed'] = round(time.perf_counter() - started, 3)
+    events.put((index, 100, "done"))
+    return result
+
+
+def _inner_options(operation, options):
+    # Files already run side by side; nested per-page pools would oversubscribe the CPU.
+    options = dict(options)
+    if engine.accepts_option(operation, 'workers'):
+        options.setdefault('workers', 1)
+    return options
+
+
+def run_batch(operation, files, output_dir=None, workers=0, progress=None, file_progress=None,
+              report_path=None, **options):
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+    spec = engine.OPERATIONS[operation]
+    if spec['output'] == 'many':
+        raise engine.PDFToolkitError(f"'{operation}' already combines all files, run it directly")
+
+    progress = progress or engine._noop_progress
+    files = list(files)
+    total = len(files)
+    cpu_bound = spec['cpu_bound']
+    if not workers and not cpu_bound:
+        # I/O-bound jobs mostly wait on the disk, so the default runs more of
+        # them than there are CPUs; an explicit limit is always kept.
+        workers = max(1, min(total, 8))
+    workers = engine.resolve_workers(workers, total)
+    options = _inner_options(operation, options)
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if cpu_bound and workers > 1:
+        import multiprocessing
+
+        manager = multiprocessing.Manager()
+        events = manager.Queue()
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        manager = None
+        events = queue.Queue()
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    file_values = [0.0] * total
+    results = [None] * total
+    totals = {'done': 0, 'value': 0.0}
+    started = time.perf_counter()
+    progress(0, f"Starting {operation} on {total} files ({workers} {'processes' if cpu_bound else 'threads'})...")
+
+    def set_value(index, value):
+        if value > file_values[index]:
+            totals['value'] += value - file_values[index]
+            file_values[index] = value
+
+    def report_overall():
+        fraction = totals['value'] / (100 * total) if total else 1
+        elapsed = time.perf_counter() - started
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        progress(fraction * 100, f"{totals['done']}/{total} files | ETA {format_eta(eta)}")
+
+    try:
+        outputs = engine.plan_outputs(operation, files, output_dir)
+        futures = {
+            pool.submit(_run_job, operation, index, path, outputs[index], options, events): index
+            for index, path in enumerate(files)
+        }
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            # Everything queued since the last pass is handled now, so the
+            # queue never falls behind the workers.
+            while True:
+                try:
+                    index, value, text = events.get_nowait()
+                except queue.Empty:
+                    break
+                set_value(index, value)
+                if file_progress:
+                    file_progress(index, files[index], value, text)
+
+            for future in finished:
+                index = futures[future]
+                results[index] = future.result()
+                set_value(index, 100)
+                totals['done'] += 1
+            report_overall()
+    finally:
+        pool.shutdown()
+        if manager is not None:
+            manager.shutdown()
+
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for r in results if r['ok'])
+    summary = {
+        'operation': operation,
+        'total': total,
+        'succeeded': succeeded,
+        'failed': total - succeeded,
+        'elapsed': round(elapsed, 3),
+        'workers': workers,
+        'pool': 'process' if cpu_bound and workers > 1 else 'thread',
+        'results': results,
+    }
+
+    if report_path is None and output_dir:
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = engine.get_unique_filename(os.path.join(output_dir, f"batch_report_{stamp}"), ".json")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, default=str)
+    summary['report'] = report_path
+
+    progress(100, f"{succeeded}/{total} files succeeded in {elapsed:.1f}s")
+    return summary
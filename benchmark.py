@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+CORPUS_VERSION = 1
+PASSWORD = "benchmark"
+
+WORDS = ("invoice total amount customer order shipping tax quarter revenue report account balance "
+         "payment summary region product market growth forecast budget analysis review contract "
+         "section clause party agreement schedule delivery volume price unit margin").split()
+
+# name -> (operation, corpus input, options); 'many' operations take a list of inputs
+CASES = {
+    'images': ('images', 'text_heavy.pdf', {'dpi': 100, 'workers': 0}),
+    'text': ('text', 'text_heavy.pdf', {}),
+    'text_huge': ('text', 'huge.pdf', {'backend': 'pymupdf', 'workers': 0}),
+    'word': ('word', 'text_heavy.pdf', {}),
+    'tables': ('tables', 'table_heavy.pdf', {'formats': ('csv',)}),
+    'tables_pymupdf': ('tables', 'table_heavy.pdf', {'backend': 'pymupdf', 'workers': 0, 'formats': ('csv',)}),
+    'images_to_pdf': ('images-to-pdf', 'images', {}),
+    'merge': ('merge', 'small_files', {}),
+    'split': ('split', 'huge.pdf', {'every': 10}),
+    'extract': ('extract', 'huge.pdf', {'pages_input': '1-100,200-300'}),
+    'rotate': ('rotate', 'huge.pdf', {'angle': 90}),
+    'compress': ('compress', 'scanned.pdf', {'quality': 60}),
+    'protect': ('protect', 'text_heavy.pdf', {'password': PASSWORD}),
+    'unlock': ('unlock', 'encrypted.pdf', {'password': PASSWORD}),
+}
+
+
+def _sentence(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count)).capitalize() + "."
+
+
+def _text_page(doc, rng, paragraphs=6):
+    page = doc.new_page()
+    body = "\n\n".join(" ".join(_sentence(rng, rng.randint(8, 16)) for _ in range(5)) for _ in range(paragraphs))
+    page.insert_text((50, 50), f"Section {len(doc)}", fontsize=16)
+    page.insert_textbox((50, 80, 545, 800), body, fontsize=10)
+    return page
+
+
+def _table_page(doc, rng, rows=20, columns=5):
+    page = doc.new_page()
+    x0, y0, cell_w, cell_h = 50, 60, 99, 18
+    for r in range(rows + 1):
+        page.draw_line((x0, y0 + r * cell_h), (x0 + columns * cell_w, y0 + r * cell_h))
+    for c in range(columns + 1):
+        page.draw_line((x0 + c * cell_w, y0), (x0 + c * cell_w, y0 + rows * cell_h))
+    for r in range(rows):
+        for c in range(columns):
+            value = rng.choice(WORDS) if c == 0 else f"{rng.uniform(0, 10000):.2f}"
+            page.insert_text((x0 + c * cell_w + 4, y0 + r * cell_h + 13), value, fontsize=9)
+    page.insert_textbox((50, 450, 545, 800), " ".join(_sentence(rng, 12) for _ in range(8)), fontsize=10)
+    return page
+
+
+def generate_corpus(folder, seed=0, scale=1.0):
+    # The corpus depends only on (seed, scale, CORPUS_VERSION); an existing corpus
+    # with the same key is reused so repeated runs skip generation.
+    import pymupdf
+
+    key = {'version': CORPUS_VERSION, 'seed': seed, 'scale': scale}
+    manifest_path = os.path.join(folder, "corpus.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('key') == key:
+            return manifest
+        shutil.rmtree(folder)
+    os.makedirs(folder, exist_ok=True)
+
+    rng = random.Random(seed)
+    count = lambda n: max(1, int(n * scale))  # noqa: E731
+    pages = {}
+
+    with pymupdf.open() as doc:
+        for _ in range(count(200)):
+            _text_page(doc, rng)
+        doc.save(os.path.join(folder, "text_heavy.pdf"), garbage=3, deflate=True)
+        pages['text_heavy.pdf'] = len(doc)
+
+        doc.save(os.path.join(folder, "encrypted.pdf"), encryption=pymupdf.PDF_ENCRYPT_AES_256,
+                 owner_pw=PASSWORD, user_pw=PASSWORD)
+        pages['encrypted.pdf'] = len(doc)
+
+        # "Scans": rasterised text pages stored as full-page JPEGs
+        images_folder = os.path.join(folder, "images")
+        os.makedirs(images_folder, exist_ok=True)
+        with pymupdf.open() as scanned:
+            for i in range(count(30)):
+                pix = doc[i].get_pixmap(dpi=200, colorspace=pymupdf.csGRAY)
+                data = pix.tobytes("jpeg", jpg_quality=90)
+                with open(os.path.join(images_folder, f"scan_{i + 1:03d}.jpg"), "wb") as f:
+                    f.write(data)
+                page = scanned.new_page()
+                page.insert_image(page.rect, stream=data)
+            scanned.save(os.path.join(folder, "scanned.pdf"))
+            pages['scanned.pdf'] = len(scanned)
+            pages['images'] = len(scanned)
+
+    with pymupdf.open() as doc:
+        for _ in range(count(60)):
+            _table_page(doc, rng)
+        doc.save(os.path.join(folder, "table_heavy.pdf"), garbage=3, deflate=True)
+        pages['table_heavy.pdf'] = len(doc)
+
+    with pymupdf.open() as doc:
+        for i in range(count(3000)):
+            page = doc.new_page()
+            page.insert_text((50, 72), f"Page {i + 1}: {_sentence(rng, 10)}", fontsize=11)
+        doc.save(os.path.join(folder, "huge.pdf"), garbage=3, deflate=True)
+        pages['huge.pdf'] = len(doc)
+
+    small_folder = os.path.join(folder, "small_files")
+    os.makedirs(small_folder, exist_ok=True)
+    for i in range(count(300)):
+        with pymupdf.open() as doc:
+            _text_page(doc, rng, paragraphs=2)
+            doc.save(os.path.join(small_folder, f"small_{i + 1:04d}.pdf"), garbage=3, deflate=True)
+    pages['small_files'] = count(300)
+
+    manifest = {'key': key, 'pages': pages}
+    with open(manifest_path, "w", encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _peak_rss_mb(who):
+    import resource
+
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_case_in_process(case, corpus_folder, output_folder):
+    import resource
+
+    import engine
+
+    operation, source, options = CASES[case]
+    source = os.path.join(corpus_folder, source)
+    options = dict(options)
+
+    started = time.perf_counter()
+    if engine.OPERATIONS[operation]['output'] == 'many':
+        files = sorted(os.path.join(source, name) for name in os.listdir(source))
+        engine.OPERATIONS[operation]['func'](files, os.path.join(output_folder, "out.pdf"), **options)
+    else:
+        engine.run_operation(operation, source, output_folder, **options)
+    wall = time.perf_counter() - started
+
+    return {
+        'wall_seconds': wall,
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF),
+        'children_peak_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def run_case(case, corpus_folder, pages, repeat=3):
+    # Every repetition runs in a fresh interpreter so peak RSS belongs to that
+    # case alone and no warm caches carry over between cases.
+    samples = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="pdf_bench_") as output_folder:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", case, "--corpus", corpus_folder,
+                 "--child-output", output_folder],
+                cwd=HERE, capture_output=True, text=True)
+        if output.returncode != 0:
+            return {'error': output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "failed"}
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    wall = statistics.median(s['wall_seconds'] for s in samples)
+    return {
+        'operation': CASES[case][0],
+        'pages': pages,
+        'runs': repeat,
+        'wall_seconds': wall,
+        'min_wall_seconds': min(s['wall_seconds'] for s in samples),
+        'pages_per_sec': pages / wall if wall > 0 else 0.0,
+        'peak_rss_mb': max(s['peak_rss_mb'] for s in samples),
+        'children_peak_rss_mb': max(s['children_peak_rss_mb'] for s in samples),
+    }
+
+
+def compare(results, baseline, time_threshold=0.10, rss_threshold=0.20):
+    # Returns (rows, regressions); a case regresses when it is slower or larger
+    # than the baseline by more than the given fraction.
+    rows, regressions = [], []
+    for case, current in results['cases'].items():
+        before = baseline.get('cases', {}).get(case)
+        if not before or 'error' in before or 'error' in current:
+            rows.append((case, current, before, None, None))
+            continue
+        time_change = current['wall_seconds'] / before['wall_seconds'] - 1 if before['wall_seconds'] else 0.0
+        rss_change = current['peak_rss_mb'] / before['peak_rss_mb'] - 1 if before['peak_rss_mb'] else 0.0
+        rows.append((case, current, before, time_change, rss_change))
+        if time_change > time_threshold:
+            regressions.append(f"{case}: {time_change:+.0%} wall time (threshold {time_threshold:.0%})")
+        if rss_change > rss_threshold:
+            regressions.append(f"{case}: {rss_change:+.0%} peak RSS (threshold {rss_threshold:.0%})")
+    return rows, regressions
+
+
+def print_table(rows):
+    print(f"{'case':<16}{'wall s':>10}{'pages/s':>11}{'RSS MB':>10}{'Δ time':>10}{'Δ RSS':>9}")
+    for case, current, before, time_change, rss_change in rows:
+        if 'error' in current:
+            print(f"{case:<16}  ERROR: {current['error']}")
+            continue
+        delta_time = f"{time_change:+.0%}" if time_change is not None else "-"
+        delta_rss = f"{rss_change:+.0%}" if rss_change is not None else "-"
+        print(f"{case:<16}{current['wall_seconds']:>10.3f}{current['pages_per_sec']:>11.1f}"
+              f"{current['peak_rss_mb']:>10.1f}{delta_time:>10}{delta_rss:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every operation on a reproducible synthetic corpus")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "pdf_toolkit_bench_corpus"),
+                        help="corpus folder (generated if missing or stale)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply corpus sizes, e.g. 0.1 for a quick run")
+    parser.add_argument("--only", help="comma separated cases to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the median wall time is kept")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed wall time regression (fraction)")
+    parser.add_argument("--rss-threshold", type=float, default=0.20, help="allowed peak RSS regression (fraction)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_case_in_process(args.child, args.corpus, args.child_output)))
+        return 0
+
+    cases = [c.strip() for c in args.only.split(",")] if args.only else list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    print(f"Preparing corpus in {args.corpus} (seed {args.seed}, scale {args.scale})...", file=sys.stderr)
+    manifest = generate_corpus(args.corpus, args.seed, args.scale)
+
+    results = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'corpus': manifest['key'],
+        'cases': {},
+    }
+    for case in cases:
+        print(f"Running {case}...", file=sys.stderr)
+        pages = manifest['pages'][CASES[case][1]]
+        results['cases'][case] = run_case(case, args.corpus, pages, args.repeat)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus') != results['corpus']:
+            print("WARNING: baseline was measured on a different corpus", file=sys.stderr)
+
+    rows, regressions = compare(results, baseline or {}, args.threshold, args.rss_threshold)
+    print_table(rows)
+
+    failed = [case for case, current in results['cases'].items() if 'error' in current]
+    if failed:
+        print(f"FAIL: {', '.join(failed)} did not complete", file=sys.stderr)
+        return 1
+    if regressions:
+        for line in regressions:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        return 1
+    print(f"OK: {len(cases)} case(s) written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PDF_TOOLKIT_CACHE_DIR',
+    os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'pdf-toolkit'),
+)
+DEFAULT_MAX_BYTES = int(os.environ.get('PDF_TOOLKIT_CACHE_MB', '512')) * 1024 * 1024
+HASH_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    digest TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    params TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (digest, page, operation, params)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def open_database(path, schema):
+    # Every on-disk store opens its SQLite file this way: one connection shared
+    # across threads behind the store's own lock, autocommit unless a
+    # transaction is begun, and WAL so readers are not blocked by a writer.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    # Keyed by (file content hash, page index, operation, parameters). The
+    # (path, size, mtime) -> hash memo means an unchanged file is never re-read.
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.path = os.path.join(directory, 'extraction_cache.sqlite')
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total = None
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['directory'], state['max_bytes'])
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, _SCHEMA)
+        return self._conn
+
+    def known_digest(self, pdf_path):
+        # The memoised digest if the file is unchanged since it was hashed, else
+        # None; never reads the file.
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT digest FROM digests WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        return row[0] if row else None
+
+    def file_digest(self, pdf_path):
+        digest = self.known_digest(pdf_path)
+        if digest:
+            return digest
+
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        digest = hash_file(path)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO digests (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest),
+            )
+        return digest
+
+    @staticmethod
+    def _params_key(params):
+        return json.dumps(params or {}, sort_keys=True, default=str)
+
+    def get(self, digest, page, operation, params=None):
+        key = (digest, page, operation, self._params_key(params))
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE digest = ? AND page = ? AND operation = ? AND params = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE entries SET last_access = ? WHERE digest = ? AND page = ? AND operation = ? AND params = ?",
+                (time.time(), *key),
+            )
+        return bytes(row[0])
+
+    def cached_pages(self, digest, operation, params=None):
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT page FROM entries WHERE digest = ? AND operation = ? AND params = ?",
+                (digest, operation, self._params_key(params)),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def put(self, digest, page, operation, value, params=None):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (digest, page, operation, params, value, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, page, operation, self._params_key(params), value, len(value), time.time()),
+            )
+            if self._total is None:
+                self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            else:
+                self._total += len(value)
+            if self._total > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # Other processes may have written too, so re-measure before trimming.
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT rowid, size FROM entries ORDER BY last_access")
+            doomed = []
+            for rowid, size in rows:
+                if total <= target:
+                    break
+                doomed.append((rowid,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE rowid = ?", doomed)
+        self._total = total
+
+    def get_text(self, digest, page, operation, params=None):
+        value = self.get(digest, page, operation, params)
+        return None if value is None else value.decode('utf-8')
+
+    def put_text(self, digest, page, operation, text, params=None):
+        self.put(digest, page, operation, (text or '').encode('utf-8'), params)
+
+    def get_json(self, digest, page, operation, params=None):
+        value = self.get(digest, page, operation, params)
+        return None if value is None else json.loads(value)
+
+    def put_json(self, digest, page, operation, data, params=None):
+        self.put(digest, page, operation, json.dumps(data).encode('utf-8'), params)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes, 'path': self.path}
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM digests")
+            self._total = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
@@ -0,0 +1,330 @@
+import argparse
+import getpass
+import glob
+import json
+import os
+import sys
+import time
+
+import batch
+import cache
+import engine
+import tracing
+
+PROGRESS_INTERVAL = 0.1
+
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if os.path.isdir(path):
+                continue
+            if path not in files:
+                files.append(path)
+    return files
+
+
+_last_progress = [0.0]
+
+
+def stderr_progress(value, text=""):
+    now = time.perf_counter()
+    if value < 100 and now - _last_progress[0] < PROGRESS_INTERVAL:
+        return
+    _last_progress[0] = now
+    sys.stderr.write(f"\r{value:5.1f}% {text[:90]:<90}")
+    sys.stderr.flush()
+
+
+def print_result(result, as_json=False):
+    if as_json:
+        print(json.dumps(result, default=str))
+    elif result["ok"]:
+        print(f"✅ {result['input']} -> {result.get('output')}")
+    else:
+        print(f"❌ {result['input']}: {result['error']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pdf-toolkit", description="Headless PDF Toolkit Pro operations")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress")
+    parser.add_argument("--json", action="store_true", help="print one JSON result per line")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="files processed at once through the batch scheduler (0 = one per CPU)")
+    parser.add_argument("--report", help="write a JSON batch summary to this path")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the extraction cache")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="time every stage and write a Chrome/Perfetto trace to PATH (summary on stderr)")
+    sub = parser.add_subparsers(dest="operation", required=True)
+
+    def add(name, help_text):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("inputs", nargs="+", help="input files or glob patterns")
+        p.add_argument("-o", "--output", help="output folder (default: next to each input)")
+        return p
+
+    def add_ocr(p):
+        p.add_argument("--ocr", action="store_true", help="recognise pages that have no text layer (needs Tesseract)")
+        p.add_argument("--ocr-dpi", type=int, default=300, help="render resolution for OCR")
+        p.add_argument("--ocr-lang", dest="ocr_language", default="eng", help="Tesseract language(s), e.g. eng+deu")
+
+    p = sub.add_parser("index", help="add PDFs or folders to the full-text search index")
+    p.add_argument("inputs", nargs="+", help="PDF files or folders (searched recursively)")
+    p.add_argument("--workers", type=int, default=0, help="indexing processes (0 = one per CPU)")
+    p.add_argument("--index", help="index database (default: in the cache folder)")
+
+    p = sub.add_parser("search", help="search the full-text index")
+    p.add_argument("query", help='words that must all appear, or "an exact phrase"')
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--under", dest="path_prefix", help="only files below this folder")
+    p.add_argument("--index", help="index database (default: in the cache folder)")
+
+    p = sub.add_parser("dedupe", help="find duplicate and near-duplicate pages and files")
+    p.add_argument("inputs", nargs="+", help="PDF files or folders (searched recursively)")
+    p.add_argument("--max-distance", type=int, default=6,
+                   help="differing bits (of 64) at which two page images still count as the same")
+    p.add_argument("--workers", type=int, default=0, help="hashing processes (0 = one per CPU)")
+    p.add_argument("--move-to", help="move duplicate files (never the copy kept) into this folder")
+    p.add_argument("--pages", dest="show_pages", action="store_true", help="also list duplicate pages")
+    p.add_argument("--store", help="hash database (default: in the cache folder)")
+
+    p = add("images", "render pages to images")
+    p.add_argument("--dpi", type=int, default=150)
+    p.add_argument("--format", dest="fmt", choices=["png", "jpg", "jpeg", "webp"], default="png")
+    p.add_argument("--quality", type=int, default=85, help="JPEG/WebP quality (1-100)")
+    p.add_argument("--pages", help="pages to render, e.g. 1-10,15 (default: all)")
+    p.add_argument("--max-pages", type=int, help="render at most this many pages")
+    p.add_argument("--workers", type=int, default=0, help="render processes (0 = one per CPU)")
+    p.add_argument("--tiles", dest="pyramid", action="store_true",
+                   help="write a Deep Zoom (DZI) tile pyramid per page instead of one image")
+    p.add_argument("--memory-mb", type=int,
+                   help="rendering memory for the whole run; larger pages are rendered in bands (default: 512)")
+
+    p = add("word", "convert to .docx")
+    p.add_argument("--plain", dest="layout", action="store_false",
+                   help="one paragraph of flattened text per page instead of the layout-aware export")
+    p.add_argument("--workers", type=int, default=0, help="page analysis processes (0 = one per CPU)")
+    add_ocr(p)
+
+    p = add("tables", "extract tables to CSV/Excel")
+    p.add_argument("--backend", choices=["pdfplumber", "pymupdf"], default="pdfplumber")
+    p.add_argument("--strategy", choices=["lines", "text"], default="lines",
+                   help="detect tables from ruling lines or from aligned text")
+    p.add_argument("--no-prefilter", dest="prefilter", action="store_false",
+                   help="run full detection on every page")
+    p.add_argument("--workers", type=int, default=1, help="detection processes (0 = one per CPU)")
+    p.add_argument("--formats", default="csv,xlsx", help="any of csv, xlsx, parquet, comma separated")
+    add_ocr(p)
+    p.epilog = "--ocr detects tables from aligned text on every page (implies --strategy text --no-prefilter)"
+
+    p = add("text", "extract text")
+    p.add_argument("--metadata", dest="include_metadata", action="store_true")
+    p.add_argument("--backend", choices=["pdfplumber", "pymupdf"], default="pdfplumber")
+    p.add_argument("--workers", type=int, default=1, help="extraction processes (0 = one per CPU)")
+    p.add_argument("--pages", help="pages to extract, e.g. 1-10,15 (default: all)")
+    add_ocr(p)
+
+    p = add("ocr", "add an invisible OCR text layer to pages that have none")
+    p.add_argument("--dpi", type=int, default=300, help="render resolution for OCR")
+    p.add_argument("--lang", dest="language", default="eng", help="Tesseract language(s), e.g. eng+deu")
+    p.add_argument("--workers", type=int, default=0, help="OCR processes (0 = one per CPU)")
+
+    p = add("images-to-pdf", "combine images into one PDF")
+    p.add_argument("--name", default="images.pdf", help="output file name")
+    p.add_argument("--page-size", choices=["a3", "a4", "a5", "letter", "legal"],
+                   help="fit each image onto this paper size (default: size pages from --dpi)")
+    p.add_argument("--dpi", type=float, default=100.0, help="image resolution used to size pages")
+    p.add_argument("--flatten-alpha", action="store_true", help="composite transparent images onto white")
+    p.add_argument("--workers", type=int, default=0, help="decoder processes (0 = one per CPU)")
+
+    p = add("merge", "merge PDFs into one")
+    p.add_argument("--name", default="merged.pdf", help="output file name")
+    p.add_argument("--file-bookmarks", action="store_true", help="add a top-level bookmark for each input file")
+    p.add_argument("--checkpoint-every", type=int, default=200,
+                   help="flush the partial result to disk every N files to bound memory (0 = never)")
+    p.add_argument("--no-dedupe", dest="dedupe_streams", action="store_false",
+                   help="skip merging identical streams on save: faster for thousands of files, larger output")
+
+    p = add("split", "split into single pages or chunks")
+    p.add_argument("--mode", choices=["pages", "bookmarks", "size"], default="pages")
+    p.add_argument("--every", type=int, default=1, help="pages per file in pages mode")
+    p.add_argument("--max-size-mb", type=float, help="maximum output size in size mode")
+    p.add_argument("--bookmark-level", type=int, default=1, help="deepest outline level to split on")
+    p.add_argument("--workers", type=int, default=0, help="writer processes (0 = one per CPU)")
+    p.add_argument("--pages", help="only split these pages in pages mode, e.g. 1-20,30- (default: all)")
+
+    p = add("extract", "extract pages")
+    p.add_argument("--pages", dest="pages_input", required=True, help="e.g. 1,3,5-8, 10-, -1 (last), odd, even")
+
+    p = add("protect", "encrypt with a password")
+    p.add_argument("--password")
+
+    p = add("unlock", "remove password protection")
+    p.add_argument("--password")
+
+    p = add("compress", "compress PDF")
+    p.add_argument("--quality", type=int, default=75)
+    p.add_argument("--target-dpi", type=int, default=150, help="downsample images above this DPI")
+    p.add_argument("--image-format", choices=["jpeg", "jpeg2000"], default="jpeg")
+    p.add_argument("--workers", type=int, default=0, help="image processes (0 = one per CPU)")
+
+    p = add("rotate", "rotate pages")
+    p.add_argument("--angle", type=int, default=90)
+    p.add_argument("--pages", dest="pages_input", help="pages to rotate, e.g. 1-3, odd, -1 (default: all)")
+    p.add_argument("--in-place", action="store_true",
+                   help="append the rotation to the input file itself instead of writing a copy")
+
+    p = add("pipeline", "run a saved recipe (extract, rotate, compress, protect) with a single save")
+    p.add_argument("--recipe", required=True, help="JSON recipe file, see README")
+    p.add_argument("--password", help="password for a protect step that does not set one")
+    p.add_argument("--workers", type=int, default=0, help="image processes for a compress step (0 = one per CPU)")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = vars(args).copy()
+    trace_path = options.pop("trace")
+    if not trace_path:
+        return run(options)
+
+    tracing.enable()
+    try:
+        return run(options)
+    finally:
+        collected = tracing.events()
+        tracing.remove_spool()
+        tracing.export_chrome(trace_path, collected)
+        print(tracing.format_summary(tracing.summary(collected)), file=sys.stderr)
+        print(f"Trace written to {trace_path}", file=sys.stderr)
+
+
+def run_search(operation, options, quiet, as_json):
+    import search_index
+
+    index = search_index.SearchIndex(options["index"]) if options.get("index") else None
+    if operation == "index":
+        summary = engine.index_pdfs(options["inputs"], options["workers"], index=index,
+                                    progress=None if quiet else stderr_progress)
+        if not quiet:
+            sys.stderr.write("\n")
+        if as_json:
+            print(json.dumps(summary))
+        else:
+            print(f"✅ {summary['files']} PDFs: {summary['indexed']} indexed, {summary['unchanged']} unchanged, "
+                  f"{summary['failed']} failed, {summary['removed']} removed")
+        return 0 if not summary["failed"] else 1
+
+    started = time.perf_counter()
+    hits = engine.search_pdfs(options["query"], options["limit"], options["path_prefix"], index=index)
+    for hit in hits:
+        print(json.dumps(hit) if as_json else f"{hit['path']}:{hit['page']}: {hit['snippet']}")
+    if not quiet:
+        print(f"{len(hits)} hits in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0 if hits else 1
+
+
+def run_dedupe(options, quiet, as_json):
+    import dedupe
+
+    store = dedupe.HashStore(options["store"]) if options.get("store") else None
+    report = engine.find_duplicates(options["inputs"], options["max_distance"], options["workers"], store=store,
+                                    progress=None if quiet else stderr_progress)
+    if not quiet:
+        sys.stderr.write("\n")
+    moved = dedupe.move_duplicates(report, options["move_to"]) if options["move_to"] else []
+
+    if as_json:
+        print(json.dumps({**report, 'moved': moved}))
+    else:
+        for group in report["duplicate_files"]:
+            print(f"= {group['keep']}")
+            for path in group["duplicates"]:
+                print(f"  {path}")
+        if options["show_pages"]:
+            for match in report["duplicate_pages"]:
+                print(f"{match['path']}:{match['page']} ~ {match['duplicate_path']}:{match['duplicate_page']} "
+                      f"(distance {match['distance']})")
+        duplicates = sum(len(group["duplicates"]) for group in report["duplicate_files"])
+        print(f"{report['files']} files, {report['pages']} pages: {duplicates} duplicate files, "
+              f"{len(report['duplicate_pages'])} duplicate page pairs"
+              + (f", {len(moved)} moved to {options['move_to']}" if moved else ""), file=sys.stderr)
+    return 0
+
+
+def run(options):
+    operation = options.pop("operation")
+    quiet = options.pop("quiet")
+    as_json = options.pop("json")
+    if operation in ("index", "search"):
+        return run_search(operation, options, quiet, as_json)
+    if operation == "dedupe":
+        return run_dedupe(options, quiet, as_json)
+    jobs_count = options.pop("jobs")
+    report_path = options.pop("report")
+    if not options.pop("no_cache") and engine.accepts_option(operation, "cache"):
+        options["cache"] = cache.default_cache()
+    inputs = expand_inputs(options.pop("inputs"))
+    output_dir = options.pop("output")
+    name = options.pop("name", None)
+
+    if not inputs:
+        print("pdf-toolkit: no input files matched", file=sys.stderr)
+        return 2
+
+    if operation == "pipeline":
+        import pipeline
+
+        # Parsed once up front, so a broken recipe fails before any file is touched.
+        options["recipe"] = pipeline.load_recipe(options["recipe"])
+        if not pipeline.needs_password(options["recipe"]):
+            options.pop("password")
+
+    if "password" in options and not options["password"]:
+        options["password"] = getpass.getpass("Password: ")
+
+    progress = None if quiet else stderr_progress
+    results = []
+
+    if engine.OPERATIONS[operation]["output"] != "many" and (jobs_count != 1 or report_path):
+        summary = batch.run_batch(operation, inputs, output_dir, workers=jobs_count, progress=progress,
+                                  report_path=report_path, **options)
+        if not quiet:
+            sys.stderr.write("\n")
+        for result in summary["results"]:
+            print_result(result, as_json)
+        return 0 if not summary["failed"] else 1
+
+    if engine.OPERATIONS[operation]["output"] == "many":
+        output_dir = output_dir or os.path.dirname(os.path.abspath(inputs[0]))
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = engine.get_unique_filename(os.path.join(output_dir, name), ".pdf")
+        jobs = [(inputs, lambda: engine.OPERATIONS[operation]["func"](inputs, output_file, progress=progress,
+                                                                       **options))]
+    else:
+        outputs = engine.plan_outputs(operation, inputs, output_dir)
+        jobs = [
+            (path, lambda path=path, output=output: engine.run_operation(operation, path, progress=progress,
+                                                                         output=output, **options))
+            for path, output in zip(inputs, outputs)
+        ]
+
+    for source, job in jobs:
+        try:
+            result = {"input": source, "ok": True, **job()}
+        except Exception as e:
+            result = {"input": source, "ok": False, "error": str(e)}
+        results.append(result)
+
+        if not quiet:
+            sys.stderr.write("\n")
+        print_result(result, as_json)
+
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+import hashlib
+import io
+import os
+
+import tracing
+from engine import _noop_progress, chunked, resolve_workers
+from progress import Meter
+
+IMAGE_FORMATS = {
+    'jpeg': '/DCTDecode',
+    'jpeg2000': '/JPXDecode',
+}
+
+# Bilevel scans are usually already CCITT/JBIG2 encoded and only get bigger as JPEG.
+MIN_BITS_PER_COMPONENT = 8
+MIN_IMAGE_BYTES = 4096
+
+_worker_doc = None
+
+
+def _init_worker(source):
+    global _worker_doc
+    import pymupdf
+
+    if isinstance(source, (bytes, bytearray)):
+        _worker_doc = pymupdf.open(stream=source, filetype="pdf")
+    else:
+        _worker_doc = pymupdf.open(source)
+
+
+def collect_images(doc):
+    images = {}
+    for page in doc:
+        for item in page.get_images(full=True):
+            xref, smask, width, height, bpc = item[:5]
+            if xref in images:
+                info = images[xref]
+            else:
+                info = images[xref] = {
+                    'xref': xref,
+                    'smask': smask,
+                    'width': width,
+                    'height': height,
+                    'bpc': bpc,
+                    'filter': item[8] if len(item) > 8 else '',
+                    'pages': [],
+                    'dpi': 0.0,
+                }
+            info['pages'].append(page.number + 1)
+            for rect in page.get_image_rects(xref):
+                if rect.width > 0 and rect.height > 0:
+                    dpi = max(width / (rect.width / 72), height / (rect.height / 72))
+                    info['dpi'] = max(info['dpi'], dpi)
+    return list(images.values())
+
+
+# Image dictionary entries that change how the same stream bytes are drawn
+IMAGE_KEYS = ('Filter', 'DecodeParms', 'ColorSpace', 'BitsPerComponent', 'Decode', 'SMask', 'Mask', 'ImageMask')
+
+
+def group_duplicates(doc, images):
+    groups = {}
+    for info in images:
+        raw = doc.xref_stream_raw(info['xref'])
+        info['original_bytes'] = len(raw) if raw else 0
+        image_dict = tuple(doc.xref_get_key(info['xref'], key) for key in IMAGE_KEYS)
+        key = (hashlib.sha1(raw or b'').hexdigest(), info['width'], info['height'], info['smask'], image_dict)
+        groups.setdefault(key, []).append(info)
+    return list(groups.values())
+
+
+def _recompress(xref, scale, quality, image_format, doc=None):
+    with tracing.span("compress.image", xref=xref, format=image_format):
+        return _recompress_image(xref, scale, quality, image_format, _worker_doc if doc is None else doc)
+
+
+def _recompress_image(xref, scale, quality, image_format, doc):
+    import pymupdf
+    from PIL import Image
+
+    pix = pymupdf.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = pymupdf.Pixmap(pix, 0)
+    if pix.n not in (1, 3):
+        pix = pymupdf.Pixmap(pymupdf.csRGB, pix)
+
+    mode = 'L' if pix.n == 1 else 'RGB'
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    del pix
+
+    if scale < 1:
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image_format == 'jpeg2000':
+        # PSNR target between ~25 dB (quality 1) and ~55 dB (quality 100)
+        img.save(buffer, 'JPEG2000', quality_mode='dB', quality_layers=[25 + quality * 0.3])
+    else:
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+
+    return {'xref': xref, 'data': buffer.getvalue(), 'width': img.width, 'height': img.height, 'mode': mode}
+
+
+def _recompress_batch(jobs, quality, image_format):
+    return [_recompress(xref, scale, quality, image_format) for xref, scale in jobs]
+
+
+def _write_image(doc, xref, result, image_format):
+    doc.update_stream(xref, result['data'], compress=False)
+    doc.xref_set_key(xref, "Filter", IMAGE_FORMATS[image_format])
+    doc.xref_set_key(xref, "Width", str(result['width']))
+    doc.xref_set_key(xref, "Height", str(result['height']))
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if result['mode'] == 'L' else "/DeviceRGB")
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    for key in ("DecodeParms", "Decode", "DL"):
+        doc.xref_set_key(xref, key, "null")
+
+
+def compress_document(doc, quality=75, target_dpi=150, image_format='jpeg', workers=0, source=None,
+                      progress=None):
+    progress = progress or _noop_progress
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+    progress(0, "Scanning embedded images...")
+    with tracing.span("compress.scan"):
+        groups = group_duplicates(doc, collect_images(doc))
+
+    jobs = []
+    report = []
+    for group in groups:
+        canonical = group[0]
+        dpi = max(info['dpi'] for info in group)
+        entry = {
+            'xref': canonical['xref'],
+            'duplicates': [info['xref'] for info in group[1:]],
+            'pages': sorted({p for info in group for p in info['pages']}),
+            'width': canonical['width'],
+            'height': canonical['height'],
+            'dpi': round(dpi, 1),
+            'original_bytes': sum(info['original_bytes'] for info in group),
+            'new_bytes': sum(info['original_bytes'] for info in group),
+            'action': 'kept',
+        }
+        report.append(entry)
+        if canonical['bpc'] < MIN_BITS_PER_COMPONENT or canonical['original_bytes'] < MIN_IMAGE_BYTES:
+            continue
+        scale = min(1.0, target_dpi / dpi) if dpi else 1.0
+        jobs.append((canonical['xref'], scale))
+
+    by_xref = {entry['xref']: entry for entry in report}
+    groups_by_xref = {group[0]['xref']: group for group in groups}
+    total_jobs = len(jobs)
+    meter = Meter(progress, total_jobs, 'image')
+    workers = resolve_workers(workers, total_jobs, min_jobs_per_worker=4)
+
+    if workers == 1:
+        results = (_recompress(xref, scale, quality, image_format, doc=doc) for xref, scale in jobs)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        if source is None:
+            source = doc.tobytes()
+        batches = list(chunked(jobs, max(1, min(8, total_jobs // (workers * 4)))))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source,))
+        results = (result
+                   for batch in pool.map(_recompress_batch, batches, [quality] * len(batches),
+                                         [image_format] * len(batches))
+                   for result in batch)
+
+    try:
+        for done, result in enumerate(results, start=1):
+            entry = by_xref[result['xref']]
+            group = groups_by_xref[result['xref']]
+            new_bytes = len(result['data']) * len(group)
+            if new_bytes < entry['original_bytes']:
+                with tracing.span("compress.write_image", xref=result['xref'], copies=len(group)):
+                    _write_image(doc, result['xref'], result, image_format)
+                    canonical_object = doc.xref_object(result['xref'], compressed=False)
+                    # Identical objects are merged by garbage=4 when the document is saved
+                    for info in group[1:]:
+                        doc.update_object(info['xref'], canonical_object)
+                        doc.update_stream(info['xref'], result['data'], compress=False)
+                entry.update({
+                    'new_bytes': new_bytes,
+                    'new_width': result['width'],
+                    'new_height': result['height'],
+                    'action': 'recompressed',
+                })
+            meter.update(done, f"Recompressed image {done}/{total_jobs}")
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    return report
+
+
+def compress_file(pdf_path, output_file, quality=75, target_dpi=150, image_format='jpeg', workers=0,
+                  progress=None):
+    import pymupdf
+
+    progress = progress or _noop_progress
+    progress(0, "Compressing PDF...")
+
+    original_size = os.path.getsize(pdf_path) / 1024
+
+    with tracing.span("compress.open"):
+        doc = pymupdf.open(pdf_path)
+    report = compress_document(doc, quality, target_dpi, image_format, workers, source=pdf_path,
+                               progress=lambda value, text="": progress(value * 0.9, text))
+
+    progress(90, "Writing compressed PDF...")
+    with tracing.span("compress.save"):
+        doc.save(output_file, garbage=4, deflate=True, clean=True)
+    doc.close()
+
+    new_size = os.path.getsize(output_file) / 1024
+    reduction = ((original_size - new_size) / original_size) * 100
+
+    return {
+        'output': output_file,
+        'original_size': original_size,
+        'new_size': new_size,
+        'reduction': reduction,
+        'images': report,
+        'images_recompressed': sum(1 for entry in report if entry['action'] == 'recompressed'),
+        'duplicates_removed': sum(len(entry['duplicates']) for entry in report if entry['action'] == 'recompressed'),
+    }
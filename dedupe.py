@@ -0,0 +1,351 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+
+import tracing
+from cache import DEFAULT_CACHE_DIR, open_database
+from engine import _noop_progress, get_unique_filename, resolve_workers
+from progress import Meter
+
+DEFAULT_HASH_PATH = os.environ.get('PDF_TOOLKIT_HASHES', os.path.join(DEFAULT_CACHE_DIR, 'page_hashes.sqlite'))
+# Pages are rendered this small for hashing; a dHash only looks at a 9x8 grid.
+HASH_DPI = 24
+HASH_COLUMNS, HASH_ROWS = 9, 8
+# Differing bits out of 64 at which two page images still count as the same scan
+DEFAULT_MAX_DISTANCE = 6
+# Bytes of the XOR block compared at once when matching
+MATCH_BLOCK_BYTES = 64 * 1024 * 1024
+COMMIT_EVERY = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    pages INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    hashed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    image_hash INTEGER NOT NULL,
+    text_hash TEXT,
+    PRIMARY KEY (path, page)
+);
+"""
+
+
+def normalize_text(text):
+    # Case, accents, hyphenation, punctuation and spacing differ between two
+    # extractions of the same page; none of them should make the pages differ.
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return ' '.join(re.findall(r'\w+', text))
+
+
+def text_hash(text):
+    normalized = normalize_text(text)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16] if normalized else None
+
+
+def image_hash(page):
+    # dHash: each bit says whether a cell of a 9x8 grey thumbnail is brighter
+    # than its right-hand neighbour. Survives rescanning, recompression and
+    # small shifts; a blank page hashes to 0.
+    import numpy as np
+    import pymupdf
+
+    zoom = HASH_DPI / 72
+    pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), colorspace=pymupdf.csGRAY, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    if pixels.shape[0] < HASH_ROWS or pixels.shape[1] < HASH_COLUMNS:
+        pixels = np.repeat(np.repeat(pixels, HASH_ROWS, axis=0), HASH_COLUMNS, axis=1)
+    # Area average onto the grid
+    row_edges = np.linspace(0, pixels.shape[0], HASH_ROWS + 1).astype(int)
+    col_edges = np.linspace(0, pixels.shape[1], HASH_COLUMNS + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(pixels.astype(np.uint32), row_edges[:-1], axis=0), col_edges[:-1], axis=1)
+    grid = sums / np.outer(np.diff(row_edges), np.diff(col_edges))
+    bits = (grid[:, 1:] > grid[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hash_pages(path):
+    # Runs in a worker.
+    import pymupdf
+
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        # Deleted since it was listed; update() drops it from the store.
+        return {'path': path, 'size': None, 'mtime_ns': None, 'pages': [], 'error': str(e)}
+    result = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'pages': [], 'error': None}
+    try:
+        with tracing.span("dedupe.hash_file", file=os.path.basename(path)), pymupdf.open(path) as doc:
+            if doc.needs_pass:
+                result['error'] = "password protected"
+                return result
+            for page in doc:
+                result['pages'].append((image_hash(page), text_hash(page.get_text("text"))))
+    except Exception as e:
+        result['error'] = str(e)
+        result['pages'] = []
+    return result
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class HashStore:
+    # Per-page image and text hashes kept on disk; a file is hashed again only
+    # when its size or mtime changed or its last attempt failed.
+
+    def __init__(self, path=DEFAULT_HASH_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, _SCHEMA)
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def update(self, paths, workers=0, progress=None):
+        # Files that failed last time are tried again, since the error may have
+        # been transient. Rows for files that no longer exist are dropped.
+        progress = progress or _noop_progress
+        known = {path: (size, mtime_ns) for path, size, mtime_ns in
+                 self._query("SELECT path, size, mtime_ns FROM files WHERE error IS NULL")}
+        changed, missing = [], []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                missing.append(path)
+                continue
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(path)
+        listed = set(paths)
+        stored = {path for (path,) in self._query("SELECT path FROM files")}
+        removed = [path for path in missing if path in stored]
+        removed.extend(path for path in stored if path not in listed and not os.path.exists(path))
+        if removed:
+            self._forget(removed)
+
+        total = len(changed)
+        unchanged = len(paths) - total - len(missing)
+        meter = Meter(progress, total, 'file')
+        if not changed:
+            return {'hashed': 0, 'unchanged': unchanged, 'failed': 0, 'removed': len(removed), **meter.stats()}
+
+        workers = resolve_workers(workers, total, min_jobs_per_worker=2)
+        if workers == 1:
+            results = map(hash_pages, changed)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(hash_pages, changed, chunksize=max(1, min(16, total // (workers * 8))))
+
+        failed = vanished = 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute("BEGIN")
+                try:
+                    for done, result in enumerate(results, start=1):
+                        conn.execute("DELETE FROM pages WHERE path = ?", (result['path'],))
+                        if result['size'] is None:
+                            conn.execute("DELETE FROM files WHERE path = ?", (result['path'],))
+                            vanished += 1
+                            meter.update(done)
+                            continue
+                        conn.execute(
+                            "INSERT OR REPLACE INTO files (path, size, mtime_ns, pages, error, hashed_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (result['path'], result['size'], result['mtime_ns'], len(result['pages']),
+                             result['error'], time.time()),
+                        )
+                        conn.executemany(
+                            "INSERT INTO pages (path, page, image_hash, text_hash) VALUES (?, ?, ?, ?)",
+                            [(result['path'], page_num, _to_signed(image), text)
+                             for page_num, (image, text) in enumerate(result['pages'])],
+                        )
+                        failed += bool(result['error'])
+                        if done % COMMIT_EVERY == 0:
+                            conn.execute("COMMIT")
+                            conn.execute("BEGIN")
+                        meter.update(done, f"Hashed {done}/{total} new or changed files")
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            if workers > 1:
+                pool.shutdown()
+        return {'hashed': total - failed - vanished, 'unchanged': unchanged, 'failed': failed,
+                'removed': len(removed) + vanished, **meter.stats()}
+
+    def _forget(self, paths):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM pages WHERE path = ?", [(path,) for path in paths])
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+            conn.execute("COMMIT")
+
+    def pages(self, paths):
+        # (path, page, image_hash, text_hash) rows for the given files, in order
+        rows = []
+        for path in paths:
+            rows.extend(self._query("SELECT path, page, image_hash, text_hash FROM pages WHERE path = ? "
+                                    "ORDER BY page", (path,)))
+        return rows
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _popcount(values):
+    import numpy as np
+
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def match_pages(image_hashes, text_hashes, max_distance=DEFAULT_MAX_DISTANCE):
+    # Pairs (i, j, distance) with i < j of pages that look alike (Hamming
+    # distance of the image hashes at most max_distance) and whose text does not
+    # disagree, plus pairs with identical non-empty text whatever they look like.
+    # The all-pairs XOR runs in blocks so memory stays near MATCH_BLOCK_BYTES.
+    import numpy as np
+
+    hashes = np.asarray(image_hashes, dtype=np.int64).view(np.uint64)
+    count = len(hashes)
+    pairs = {}
+
+    block = max(1, MATCH_BLOCK_BYTES // max(1, count * 8))
+    blank = hashes == 0
+    for start in range(0, count, block):
+        with tracing.span("dedupe.match_block", start=start):
+            rows = hashes[start:start + block]
+            distances = _popcount(rows[:, None] ^ hashes[None, :])
+            close = distances <= max_distance
+            # Only pairs above the diagonal, and never blank pages
+            close &= np.arange(start, start + len(rows))[:, None] < np.arange(count)[None, :]
+            close &= ~blank[start:start + len(rows), None] & ~blank[None, :]
+            for i, j in zip(*np.nonzero(close)):
+                i, j = start + int(i), int(j)
+                if text_hashes[i] and text_hashes[j] and text_hashes[i] != text_hashes[j]:
+                    continue
+                pairs[(i, j)] = int(distances[i - start, j])
+
+    # Identical text is linked to its first occurrence only, so a boilerplate
+    # page repeated thousands of times adds thousands of pairs, not millions.
+    first_with_text = {}
+    for j, value in enumerate(text_hashes):
+        if not value:
+            continue
+        i = first_with_text.setdefault(value, j)
+        if i != j:
+            pairs.setdefault((i, j), int(_popcount(hashes[i:i + 1] ^ hashes[j:j + 1])[0]))
+    return sorted((i, j, distance) for (i, j), distance in pairs.items())
+
+
+def find_duplicates(paths, max_distance=DEFAULT_MAX_DISTANCE, workers=0, store=None, progress=None):
+    from search_index import find_pdfs
+
+    progress = progress or _noop_progress
+    progress(0, "Scanning for PDFs...")
+    store = store or default_store()
+    files = find_pdfs(paths)
+
+    hashed = store.update(files, workers, progress=lambda value, text="": progress(value * 0.9, text))
+    progress(90, "Comparing pages...")
+    rows = store.pages(files)
+    with tracing.span("dedupe.match", pages=len(rows)):
+        pairs = match_pages([row[2] for row in rows], [row[3] for row in rows], max_distance)
+
+    page_counts, blank_pages = {}, {}
+    for path, page, image, text in rows:
+        page_counts[path] = page_counts.get(path, 0) + 1
+        if image == 0 and not text:
+            blank_pages.setdefault(path, set()).add(page)
+
+    # A file duplicates another when every page matches the page at the same
+    # position in a file of the same length; blank pages are never matched, so
+    # positions where both files are blank count as matching.
+    aligned = {}
+    for i, j, _ in pairs:
+        a, b = rows[i], rows[j]
+        if a[0] != b[0] and a[1] == b[1] and page_counts[a[0]] == page_counts[b[0]]:
+            key = (a[0], b[0]) if a[0] < b[0] else (b[0], a[0])
+            aligned[key] = aligned.get(key, 0) + 1
+    parent = {}
+
+    def root(path):
+        while parent.get(path, path) != path:
+            path = parent[path]
+        return path
+
+    for (a, b), matched in aligned.items():
+        if matched + len(blank_pages.get(a, set()) & blank_pages.get(b, set())) == page_counts[a]:
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for path in parent:
+        groups.setdefault(root(path), set()).add(path)
+    duplicate_files = [{'keep': keep, 'duplicates': sorted(members - {keep})}
+                       for keep, members in sorted(groups.items())]
+
+    duplicate_pages = [{'path': rows[i][0], 'page': rows[i][1] + 1, 'duplicate_path': rows[j][0],
+                        'duplicate_page': rows[j][1] + 1, 'distance': distance}
+                       for i, j, distance in pairs]
+    progress(100, f"Found {sum(len(g['duplicates']) for g in duplicate_files)} duplicate files")
+    return {
+        'files': len(files),
+        'pages': len(rows),
+        'duplicate_files': duplicate_files,
+        'duplicate_pages': duplicate_pages,
+        'max_distance': max_distance,
+        **{key: hashed[key] for key in ('hashed', 'unchanged', 'failed', 'removed')},
+    }
+
+
+def move_duplicates(report, folder):
+    # Moves every file listed as a duplicate (never the one kept) into folder.
+    os.makedirs(folder, exist_ok=True)
+    moved = []
+    for group in report['duplicate_files']:
+        for path in group['duplicates']:
+            base = os.path.join(folder, os.path.splitext(os.path.basename(path))[0])
+            target = get_unique_filename(base, '.pdf')
+            shutil.move(path, target)
+            moved.append((path, target))
+    return moved
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = HashStore()
+    return _default_store
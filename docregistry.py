@@ -0,0 +1,216 @@
+import io
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import tracing
+
+KINDS = ('pymupdf', 'pypdf2', 'pdfplumber')
+DEFAULT_MAX_HANDLES = int(os.environ.get('PDF_TOOLKIT_MAX_HANDLES', '8'))
+# Unused handles are closed after this many seconds, so the app does not keep
+# files open (and, on Windows, locked against rename or delete) between operations.
+DEFAULT_IDLE_SECONDS = float(os.environ.get('PDF_TOOLKIT_HANDLE_IDLE', '30'))
+
+
+class _Entry:
+    __slots__ = ('handle', 'buffer', 'lock', 'users', 'retired', 'idle_since')
+
+    def __init__(self, handle, buffer):
+        self.handle = handle
+        self.buffer = buffer
+        # Re-entrant so an operation holding a handle can call helpers that ask
+        # for the same one.
+        self.lock = threading.RLock()
+        self.users = 0
+        self.retired = False
+        self.idle_since = None
+
+    def close(self):
+        try:
+            self.handle.close()
+        finally:
+            if self.buffer is not None:
+                try:
+                    self.buffer.close()
+                except BufferError:
+                    # Something still holds a view into the map; it is released
+                    # once that view is garbage collected.
+                    pass
+
+
+def _map_file(path):
+    with open(path, 'rb') as f:
+        # An empty file cannot be mapped; handing the parser no bytes lets it
+        # raise its usual error for an invalid PDF.
+        if os.fstat(f.fileno()).st_size == 0:
+            return io.BytesIO()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _open_handle(path, kind):
+    if kind == 'pymupdf':
+        import pymupdf
+
+        # MuPDF already reads lazily from the file, so a path open is as cheap as
+        # a mapped one and avoids copying the map into a bytes object.
+        return _Entry(pymupdf.open(path), None)
+
+    # Every handle gets its own map: the parsers seek independently, while the
+    # pages behind the maps are shared through the OS page cache.
+    buffer = _map_file(path)
+    try:
+        if kind == 'pypdf2':
+            from PyPDF2 import PdfReader
+
+            return _Entry(PdfReader(buffer), buffer)
+        if kind == 'pdfplumber':
+            import pdfplumber
+
+            return _Entry(pdfplumber.open(buffer), buffer)
+    except Exception:
+        buffer.close()
+        raise
+    buffer.close()
+    raise ValueError(f"Unknown document kind: {kind} (choose from {', '.join(KINDS)})")
+
+
+class DocumentRegistry:
+    # An LRU of parsed read-only handles keyed by (path, size, mtime, library).
+    # A changed file gets a new key, so stale handles are never handed out.
+    # Callers must not modify a shared handle; operations that mutate the parsed
+    # document (rotate, unlock) open their own.
+
+    def __init__(self, max_handles=DEFAULT_MAX_HANDLES, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.max_handles = max(1, max_handles)
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(pdf_path, kind):
+        path = os.path.abspath(pdf_path)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns, kind
+
+    @contextmanager
+    def document(self, pdf_path, kind='pymupdf'):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown document kind: {kind} (choose from {', '.join(KINDS)})")
+        key = self._key(pdf_path, kind)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.users += 1
+                entry.idle_since = None
+                self.hits += 1
+        if entry is None:
+            entry = self._open(key)
+
+        try:
+            with entry.lock:
+                yield entry.handle
+        finally:
+            self._release(entry)
+
+    def _open(self, key):
+        path, _, _, kind = key
+        with tracing.span("registry.open", kind=kind, file=os.path.basename(path)):
+            entry = _open_handle(path, kind)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another thread opened it first; use theirs.
+                existing.users += 1
+                existing.idle_since = None
+                to_close = [entry]
+                entry = existing
+            else:
+                self.misses += 1
+                entry.users += 1
+                to_close = self._retire([k for k in self._entries if k[0] == path and k[3] == kind])
+                self._entries[key] = entry
+                excess = len(self._entries) - self.max_handles
+                if excess > 0:
+                    to_close.extend(self._retire(list(self._entries)[:excess]))
+        for old in to_close:
+            old.close()
+        return entry
+
+    def _retire(self, keys):
+        # Called with the registry lock held. Entries still in use are closed by
+        # their last user in _release.
+        to_close = []
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            entry.retired = True
+            if entry.users == 0:
+                to_close.append(entry)
+        return to_close
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            close = entry.retired and entry.users == 0
+            if entry.users == 0 and not entry.retired and self.idle_seconds is not None:
+                entry.idle_since = time.monotonic()
+                self._schedule_sweep(self.idle_seconds)
+        if close:
+            entry.close()
+
+    def _schedule_sweep(self, delay):
+        # Called with the registry lock held; one timer at a time.
+        if self._timer is not None:
+            return
+        self._timer = threading.Timer(delay, self._sweep)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            idle = [(key, entry.idle_since) for key, entry in self._entries.items()
+                    if entry.users == 0 and entry.idle_since is not None]
+            to_close = self._retire([key for key, since in idle if now - since >= self.idle_seconds])
+            waiting = [since for _, since in idle if now - since < self.idle_seconds]
+            if waiting:
+                self._schedule_sweep(min(waiting) + self.idle_seconds - now)
+        for entry in to_close:
+            entry.close()
+
+    def invalidate(self, pdf_path=None):
+        path = os.path.abspath(pdf_path) if pdf_path else None
+        with self._lock:
+            to_close = self._retire([key for key in self._entries if path is None or key[0] == path])
+        for entry in to_close:
+            entry.close()
+
+    def close(self):
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {'handles': len(self._entries), 'max_handles': self.max_handles,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = DocumentRegistry()
+        return _default_registry
@@ -0,0 +1,697 @@
+import os
+import time
+
+import tracing
+from progress import Meter
+
+
+class PDFToolkitError(Exception):
+    pass
+
+
+class IncorrectPasswordError(PDFToolkitError):
+    pass
+
+
+class NotEncryptedError(PDFToolkitError):
+    pass
+
+
+# Imported on first use by the operations that need them, never at module load.
+HEAVY_MODULES = ('pymupdf', 'PIL.Image', 'PyPDF2', 'pdfplumber', 'docx', 'pandas')
+
+
+def _noop_progress(value, text=""):
+    pass
+
+
+# Part of the progress bar taken by OCR when an export runs it first
+OCR_SHARE = 50
+
+
+def _share(progress, start, span):
+    # Maps a stage's 0-100 progress onto [start, start + span] of the whole.
+    return lambda value, text="": progress(start + value * span / 100, text)
+
+
+def warm_up(modules=HEAVY_MODULES):
+    import importlib
+
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+def get_unique_filename(base_path, extension, taken=()):
+    # taken holds paths already promised to other jobs that may not exist yet.
+    counter = 1
+    base_name = os.path.splitext(base_path)[0]
+    new_path = f"{base_name}{extension}"
+
+    while os.path.exists(new_path) or new_path in taken:
+        new_path = f"{base_name}_{counter}{extension}"
+        counter += 1
+
+    return new_path
+
+
+def get_unique_folder(base_folder):
+    counter = 1
+    new_folder = base_folder
+
+    while os.path.exists(new_folder):
+        new_folder = f"{base_folder}_{counter}"
+        counter += 1
+
+    return new_folder
+
+
+def page_count(pdf_path, cache=None):
+    # pymupdf reads the count from the xref, which is cheaper than hashing the
+    # file, so the cache is only used when the digest is already memoised.
+    from docregistry import default_registry
+
+    digest = cache.known_digest(pdf_path) if cache is not None else None
+    if digest:
+        cached = cache.get_json(digest, -1, 'page_count')
+        if cached is not None:
+            return cached
+
+    with default_registry().document(pdf_path, 'pymupdf') as doc:
+        count = len(doc)
+
+    if digest:
+        cache.put_json(digest, -1, 'page_count', count)
+    return count
+
+
+def _thumbnail_png(page, width):
+    import pymupdf
+
+    zoom = width / page.rect.width if page.rect.width else 1
+    return page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom)).tobytes("png")
+
+
+def preview_pdf(pdf_path, max_lines=10, thumbnail_width=200, cache=None, is_cancelled=None):
+    # Page count, the first lines of page 1 and a page 1 thumbnail from a single
+    # pymupdf handle. Returns None as soon as is_cancelled() turns true.
+    from docregistry import default_registry
+
+    is_cancelled = is_cancelled or (lambda: False)
+    params = {'lines': max_lines}
+    thumbnail_params = {'width': thumbnail_width}
+
+    # Only a memoised digest is used up front: hashing a large file before the
+    # first cancellation check would read all of it for a preview that may
+    # already be stale.
+    digest = cache.known_digest(pdf_path) if cache is not None else None
+    if digest:
+        cached = cache.get_json(digest, -1, 'preview', params)
+        thumbnail = cache.get(digest, 0, 'thumbnail', thumbnail_params)
+        if cached is not None and (thumbnail is not None or not cached['pages'] or cached['encrypted']):
+            return {**cached, 'thumbnail': thumbnail}
+    if is_cancelled():
+        return None
+
+    result = {'pages': 0, 'lines': [], 'more': False, 'encrypted': False}
+    thumbnail = None
+    with tracing.span("preview.open"), default_registry().document(pdf_path, 'pymupdf') as doc:
+        result['pages'] = len(doc)
+        result['encrypted'] = doc.needs_pass
+        if result['pages'] and not result['encrypted']:
+            if is_cancelled():
+                return None
+            with tracing.span("preview.text"):
+                lines = doc[0].get_text("text", sort=True).split('\n')
+            result['lines'] = lines[:max_lines]
+            result['more'] = len(lines) > max_lines
+            if is_cancelled():
+                return None
+            with tracing.span("preview.thumbnail"):
+                thumbnail = _thumbnail_png(doc[0], thumbnail_width)
+
+    if cache is not None and not is_cancelled():
+        digest = digest or cache.file_digest(pdf_path)
+        cache.put_json(digest, -1, 'preview', result, params)
+        if thumbnail is not None:
+            cache.put(digest, 0, 'thumbnail', thumbnail, thumbnail_params)
+    return {**result, 'thumbnail': thumbnail}
+
+
+def resolve_workers(workers, jobs=None, min_jobs_per_worker=1):
+    if not workers:
+        workers = os.cpu_count() or 1
+        if jobs is not None:
+            workers = min(workers, max(1, jobs // min_jobs_per_worker))
+    return max(1, workers)
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def select_pages(total_pages, pages=None, max_pages=None):
+    if pages is None:
+        selected = list(range(total_pages))
+    else:
+        if isinstance(pages, str):
+            import pagesel
+
+            selected = list(pagesel.parse_pages(pages, total_pages).indexes())
+        else:
+            selected = sorted({p - 1 for p in pages if 1 <= p <= total_pages})
+    if max_pages:
+        selected = selected[:max_pages]
+    return selected
+
+
+_render_doc = None
+
+
+def _init_render_worker(pdf_path):
+    global _render_doc
+    import pymupdf
+
+    _render_doc = pymupdf.open(pdf_path)
+
+
+def _render_pages(page_numbers, zoom, image_folder, fmt, options, doc=None):
+    import render
+
+    if doc is None:
+        doc = _render_doc
+    return [render.render_page(doc, page_num, zoom, image_folder, fmt, **options) for page_num in page_numbers]
+
+
+def pdf_to_images(pdf_path, output_folder, dpi=150, fmt='png', pages=None, max_pages=None, workers=1, quality=85,
+                  pyramid=False, memory_mb=None, progress=None):
+    # memory_mb caps the rendering memory of the whole run and is shared between
+    # the workers; pages too large for a worker's share are rendered in bands.
+    import pymupdf
+    import render
+
+    progress = progress or _noop_progress
+    progress(0, "Converting PDF to images...")
+
+    if fmt not in render.FORMATS:
+        raise ValueError(f"Unknown image format: {fmt} (choose from {', '.join(render.FORMATS)})")
+
+    with tracing.span("images.open"):
+        doc = pymupdf.open(pdf_path)
+    page_numbers = select_pages(len(doc), pages, max_pages)
+    total_pages = len(page_numbers)
+    zoom = dpi / 72
+
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    image_folder = os.path.join(output_folder, f"{base_name}_images")
+    os.makedirs(image_folder, exist_ok=True)
+
+    workers = resolve_workers(workers, total_pages, min_jobs_per_worker=4)
+    budget = (memory_mb or render.DEFAULT_MEMORY_MB) * 1024 * 1024 // workers
+    options = {'quality': quality, 'budget_bytes': budget, 'pyramid': pyramid}
+    rendered = []
+    meter = Meter(progress, total_pages)
+
+    if workers == 1:
+        for i, page_num in enumerate(page_numbers):
+            rendered.extend(_render_pages([page_num], zoom, image_folder, fmt, options, doc=doc))
+            meter.update(i + 1, f"Processed page {page_num + 1} ({i + 1}/{total_pages})")
+        doc.close()
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        doc.close()
+        # Contiguous shards keep each worker's reads local; several shards per worker
+        # keep the pool busy when some pages are much heavier than others.
+        shard_size = max(1, min(32, total_pages // (workers * 4)))
+        shards = list(chunked(page_numbers, shard_size))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                 initargs=(pdf_path,)) as pool:
+            results = pool.map(_render_pages, shards, [zoom] * len(shards),
+                               [image_folder] * len(shards), [fmt] * len(shards), [options] * len(shards))
+            for shard, shard_results in zip(shards, results):
+                rendered.extend(shard_results)
+                meter.update(len(rendered),
+                             f"Processed page {shard[-1] + 1} ({len(rendered)}/{total_pages}, {workers} workers)")
+
+    return {
+        'output': image_folder,
+        'pages': total_pages,
+        'files': [page['path'] for page in rendered],
+        'banded_pages': sum(1 for page in rendered if 'bands' in page),
+        'tiles': sum(page.get('tiles', 0) for page in rendered),
+        'workers': workers,
+        **meter.stats(),
+    }
+
+
+def pdf_to_word(pdf_path, output_file, layout=True, workers=0, ocr=False, ocr_dpi=300, ocr_language='eng',
+                cache=None, progress=None):
+    if ocr:
+        import ocr as ocr_engine
+
+        progress = progress or _noop_progress
+        with ocr_engine.searchable_copy(pdf_path, ocr_dpi, ocr_language, workers, cache,
+                                        progress=_share(progress, 0, OCR_SHARE)) as source:
+            # The temporary copy is not worth caching; recognised pages are cached by OCR itself.
+            return pdf_to_word(source, output_file, layout, workers, cache=cache if source == pdf_path else None,
+                               progress=_share(progress, OCR_SHARE, 100 - OCR_SHARE))
+
+    if layout:
+        import word_export
+
+        return word_export.export_word(pdf_path, output_file, workers, progress=progress)
+
+    from docx import Document
+    from docregistry import default_registry
+    import textextract
+
+    progress = progress or _noop_progress
+    progress(0, "Converting PDF to Word...")
+
+    with default_registry().document(pdf_path, 'pdfplumber') as pdf:
+        total_pages = len(pdf.pages)
+        meter = Meter(progress, total_pages)
+        doc = Document()
+
+        with tracing.span("word.metadata"):
+            metadata = pdf.metadata
+            if metadata:
+                doc.core_properties.title = metadata.get('Title', '')
+                doc.core_properties.author = metadata.get('Author', '')
+
+        pages_iter = textextract.iter_page_text(pdf_path, list(range(total_pages)), 'pdfplumber', handle=pdf,
+                                                cache=cache)
+        for i, (page_num, text) in enumerate(pages_iter):
+            if text:
+                with tracing.span("word.paragraph", page=page_num):
+                    doc.add_paragraph(text)
+
+            meter.update(i + 1)
+
+        with tracing.span("word.save"):
+            doc.save(output_file)
+
+    return {'output': output_file, 'pages': total_pages, **meter.stats()}
+
+
+def extract_tables(pdf_path, output_folder, backend='pdfplumber', strategy='lines', prefilter=True, workers=1,
+                   formats=('csv', 'xlsx'), ocr=False, ocr_dpi=300, ocr_language='eng', cache=None, progress=None):
+    if ocr:
+        # Scans have no ruling lines, so recognised pages only yield tables with
+        # the 'text' strategy and the prefilter off; both are forced here.
+        import ocr as ocr_engine
+
+        progress = progress or _noop_progress
+        with ocr_engine.searchable_copy(pdf_path, ocr_dpi, ocr_language, workers, cache,
+                                        progress=_share(progress, 0, OCR_SHARE)) as source:
+            result = extract_tables(source, output_folder, backend, 'text', False, workers, formats,
+                                    cache=cache if source == pdf_path else None,
+                                    progress=_share(progress, OCR_SHARE, 100 - OCR_SHARE))
+        return result
+
+    import pandas as pd
+    import tables as table_engine
+
+    progress = progress or _noop_progress
+    progress(0, "Extracting tables from PDF...")
+
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    table_folder = os.path.join(output_folder, f"{base_name}_tables")
+    sink = table_engine.TableSink(table_folder, formats)
+
+    total_pages = page_count(pdf_path, cache=cache)
+    meter = Meter(progress, total_pages)
+    skipped_pages = 0
+
+    pages_iter = table_engine.iter_page_tables(pdf_path, list(range(total_pages)), backend, strategy, prefilter,
+                                               workers, cache=cache)
+    try:
+        for i, (page_num, tables, skipped) in enumerate(pages_iter):
+            skipped_pages += skipped
+            for table_num, table_data in enumerate(tables):
+                if table_data:
+                    with tracing.span("tables.dataframe", page=page_num, table=table_num):
+                        df = pd.DataFrame(table_data)
+                        df = df.dropna(how='all').dropna(axis=1, how='all')
+
+                    if not df.empty:
+                        with tracing.span("tables.write", page=page_num, table=table_num):
+                            sink.write(page_num + 1, table_num + 1, df)
+
+            meter.update(i + 1)
+    finally:
+        with tracing.span("tables.close"):
+            sink.close()
+
+    return {
+        'output': table_folder if sink.count else None,
+        'pages': total_pages,
+        'tables': sink.count,
+        'formats': sink.formats,
+        'skipped_pages': skipped_pages,
+        **meter.stats(),
+    }
+
+
+def pdf_to_text(pdf_path, output_file, include_metadata=False, backend='pdfplumber', workers=1, pages=None,
+                ocr=False, ocr_dpi=300, ocr_language='eng', cache=None, progress=None):
+    from docregistry import default_registry
+    import textextract
+
+    progress = progress or _noop_progress
+    progress(0, "Extracting text from PDF...")
+
+    if backend not in textextract.BACKENDS:
+        raise ValueError(f"Unknown text backend: {backend} (choose from {', '.join(textextract.BACKENDS)})")
+
+    with default_registry().document(pdf_path, backend) as handle:
+        page_numbers = select_pages(textextract.document_page_count(handle, backend), pages)
+        total_pages = len(page_numbers)
+
+    recognized = {}
+    if ocr:
+        import ocr as ocr_engine
+
+        recognized = ocr_engine.recognize(pdf_path, page_numbers, ocr_dpi, ocr_language, workers, cache,
+                                          progress=_share(progress, 0, OCR_SHARE))
+        progress = _share(progress, OCR_SHARE, 100 - OCR_SHARE)
+
+    with default_registry().document(pdf_path, backend) as handle:
+        meter = Meter(progress, total_pages)
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            if include_metadata:
+                metadata = textextract.document_metadata(handle, backend)
+                if metadata:
+                    f.write("=== PDF METADATA ===\n")
+                    for key, value in metadata.items():
+                        f.write(f"{key}: {value}\n")
+                    f.write("\n")
+
+            pages_iter = textextract.iter_page_text(pdf_path, page_numbers, backend, workers, handle=handle,
+                                                    cache=cache)
+            for i, (page_num, text) in enumerate(pages_iter):
+                if page_num in recognized and not (text or '').strip():
+                    text = recognized[page_num]['text']
+                if text:
+                    with tracing.span("text.write", page=page_num):
+                        f.write(f"\n=== Page {page_num + 1} ===\n\n")
+                        f.write(text)
+
+                meter.update(i + 1)
+
+    return {'output': output_file, 'pages': total_pages, 'backend': backend,
+            'ocr_pages': sorted(page_num + 1 for page_num in recognized), **meter.stats()}
+
+
+def images_to_pdf(image_files, output_file, page_size=None, dpi=100.0, flatten_alpha=False, workers=0,
+                  progress=None):
+    import imagepdf
+
+    return imagepdf.build_pdf(image_files, output_file, page_size, dpi, flatten_alpha, workers, progress=progress)
+
+
+def merge_pdfs(pdf_files, output_file, file_bookmarks=False, checkpoint_every=200, dedupe_streams=True,
+               progress=None):
+    import merge
+
+    return merge.merge_files(pdf_files, output_file, file_bookmarks, checkpoint_every, dedupe_streams,
+                             progress=progress)
+
+
+def split_pdf(pdf_path, output_folder, mode='pages', every=1, max_size_mb=None, bookmark_level=1, workers=0,
+              pages=None, progress=None):
+    import split
+
+    return split.split_file(pdf_path, output_folder, mode, every, max_size_mb, bookmark_level, workers, pages,
+                            progress=progress)
+
+
+def index_pdfs(paths, workers=0, index=None, progress=None):
+    from search_index import default_index
+
+    return (index or default_index()).update(paths, workers, progress=progress)
+
+
+def search_pdfs(query, limit=50, path_prefix=None, index=None):
+    from search_index import default_index
+
+    return (index or default_index()).search(query, limit, path_prefix=path_prefix)
+
+
+def find_duplicates(paths, max_distance=6, workers=0, store=None, progress=None):
+    import dedupe
+
+    return dedupe.find_duplicates(paths, max_distance, workers, store, progress=progress)
+
+
+def extract_pages(pdf_path, pages_input, output_file, progress=None):
+    from PyPDF2 import PdfWriter
+    import pagesel
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    progress(0, "Extracting pages...")
+
+    with default_registry().document(pdf_path, 'pypdf2') as reader:
+        selection = pagesel.parse_pages(pages_input, len(reader.pages))
+        writer = PdfWriter()
+
+        total_pages = len(selection)
+        meter = Meter(progress, total_pages)
+        extracted = 0
+        for page_index in selection.indexes():
+            with tracing.span("pypdf2.add_page", page=page_index):
+                writer.add_page(reader.pages[page_index])
+            extracted += 1
+
+            meter.update(extracted, f"Extracted page {extracted}/{total_pages}")
+
+        with tracing.span("pypdf2.write"), open(output_file, 'wb') as output_pdf:
+            writer.write(output_pdf)
+
+    return {'output': output_file, 'pages': extracted, **meter.stats()}
+
+
+def protect_pdf(pdf_path, output_file, password, progress=None):
+    from PyPDF2 import PdfWriter
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    progress(0, "Protecting PDF...")
+
+    with default_registry().document(pdf_path, 'pypdf2') as reader:
+        writer = PdfWriter()
+
+        with tracing.span("pypdf2.add_pages"):
+            for page in reader.pages:
+                writer.add_page(page)
+
+        with tracing.span("pypdf2.encrypt"):
+            writer.encrypt(password)
+
+        with tracing.span("pypdf2.write"), open(output_file, 'wb') as output_pdf:
+            writer.write(output_pdf)
+
+    return {'output': output_file, 'pages': len(reader.pages)}
+
+
+def unlock_pdf(pdf_path, output_file, password, progress=None):
+    from PyPDF2 import PdfReader, PdfWriter
+
+    progress = progress or _noop_progress
+    progress(0, "Unlocking PDF...")
+
+    with open(pdf_path, 'rb') as file:
+        with tracing.span("pypdf2.read"):
+            reader = PdfReader(file)
+
+        if not reader.is_encrypted:
+            raise NotEncryptedError("PDF is not encrypted")
+        with tracing.span("pypdf2.decrypt"):
+            if not reader.decrypt(password):
+                raise IncorrectPasswordError("Incorrect password")
+
+        writer = PdfWriter()
+        with tracing.span("pypdf2.add_pages"):
+            for page in reader.pages:
+                writer.add_page(page)
+
+        with tracing.span("pypdf2.write"), open(output_file, 'wb') as output_pdf:
+            writer.write(output_pdf)
+
+    return {'output': output_file, 'pages': len(reader.pages)}
+
+
+def compress_pdf(pdf_path, output_file, quality=75, target_dpi=150, image_format='jpeg', workers=0,
+                 progress=None):
+    import compress
+
+    return compress.compress_file(pdf_path, output_file, quality, target_dpi, image_format, workers,
+                                  progress=progress)
+
+
+def rotate_pdf(pdf_path, output_file, angle, pages_input=None, in_place=False, progress=None):
+    # Only the /Rotate entries of the selected pages change, so they are appended
+    # to the file as an incremental update instead of rewriting every object.
+    # in_place updates pdf_path itself; otherwise the update goes onto a copy.
+    import shutil
+
+    import pagesel
+    import pymupdf
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    progress(0, "Rotating PDF...")
+
+    if angle % 90:
+        raise ValueError(f"Rotation must be a multiple of 90 degrees, got {angle}")
+    if in_place:
+        output_file = pdf_path
+    copied = os.path.abspath(output_file) != os.path.abspath(pdf_path)
+    if copied:
+        with tracing.span("rotate.copy"):
+            shutil.copyfile(pdf_path, output_file)
+    # Cached read-only handles must not see the file change underneath them.
+    default_registry().invalidate(output_file)
+
+    try:
+        with tracing.span("rotate.open"):
+            doc = pymupdf.open(output_file)
+        try:
+            if doc.needs_pass:
+                raise PDFToolkitError("PDF is password protected, unlock it before rotating")
+            total_pages = len(doc)
+            selection = pagesel.parse_pages(pages_input, total_pages)
+            meter = Meter(progress, len(selection))
+            rotated_count = 0
+
+            for page_index in selection.indexes():
+                with tracing.span("rotate.page", page=page_index):
+                    page = doc[page_index]
+                    page.set_rotation((page.rotation + angle) % 360)
+                rotated_count += 1
+                meter.update(rotated_count)
+
+            incremental = doc.can_save_incrementally()
+            with tracing.span("rotate.save", incremental=incremental):
+                if incremental:
+                    doc.saveIncr()
+                else:
+                    # Repaired or otherwise unusual files need a full rewrite.
+                    data = doc.tobytes(garbage=1, deflate=True)
+        finally:
+            doc.close()
+        if not incremental:
+            with open(output_file, 'wb') as output_pdf:
+                output_pdf.write(data)
+    except BaseException:
+        # A half-rotated copy is worse than none.
+        if copied and os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+
+    return {'output': output_file, 'pages': total_pages, 'rotated': rotated_count, 'incremental': incremental,
+            **meter.stats()}
+
+
+def ocr_pdf(pdf_path, output_file, dpi=300, language='eng', workers=0, cache=None, progress=None):
+    import ocr as ocr_engine
+
+    return ocr_engine.make_searchable(pdf_path, output_file, dpi, language, workers, cache, progress=progress)
+
+
+def run_pipeline(pdf_path, output_file, recipe, password=None, workers=0, progress=None):
+    import pipeline
+
+    return pipeline.run_pipeline(pdf_path, output_file, recipe, password, workers, progress=progress)
+
+
+# name -> how the CLI and other front ends map one input file to an output path.
+# 'folder' operations write into a directory, 'file' operations into base name + ext,
+# 'many' operations consume the whole input list at once. 'cpu_bound' operations
+# are spread over processes when batched, the rest over threads.
+OPERATIONS = {
+    'images': {'func': pdf_to_images, 'output': 'folder', 'cpu_bound': True},
+    'word': {'func': pdf_to_word, 'output': 'file', 'ext': '.docx', 'cpu_bound': True},
+    'tables': {'func': extract_tables, 'output': 'folder', 'cpu_bound': True},
+    'text': {'func': pdf_to_text, 'output': 'file', 'ext': '.txt', 'cpu_bound': True},
+    'images-to-pdf': {'func': images_to_pdf, 'output': 'many', 'ext': '.pdf', 'cpu_bound': True},
+    'merge': {'func': merge_pdfs, 'output': 'many', 'ext': '.pdf', 'cpu_bound': False},
+    'split': {'func': split_pdf, 'output': 'folder', 'cpu_bound': False},
+    'extract': {'func': extract_pages, 'output': 'file', 'ext': '.pdf', 'suffix': '_extracted', 'cpu_bound': False},
+    'protect': {'func': protect_pdf, 'output': 'file', 'ext': '.pdf', 'suffix': '_protected', 'cpu_bound': False},
+    'unlock': {'func': unlock_pdf, 'output': 'file', 'ext': '.pdf', 'suffix': '_unlocked', 'cpu_bound': False},
+    'compress': {'func': compress_pdf, 'output': 'file', 'ext': '.pdf', 'suffix': '_compressed', 'cpu_bound': True},
+    'rotate': {'func': rotate_pdf, 'output': 'file', 'ext': '.pdf', 'suffix': '_rotated', 'cpu_bound': False},
+    'ocr': {'func': ocr_pdf, 'output': 'file', 'ext': '.pdf', 'suffix': '_ocr', 'cpu_bound': True},
+    'pipeline': {'func': run_pipeline, 'output': 'file', 'ext': '.pdf', 'suffix': '_processed', 'cpu_bound': True},
+}
+
+
+def accepts_option(operation, name):
+    import inspect
+
+    return name in inspect.signature(OPERATIONS[operation]['func']).parameters
+
+
+def output_path_for(operation, input_path, output_dir=None, taken=()):
+    spec = OPERATIONS[operation]
+    output_dir = output_dir or os.path.dirname(os.path.abspath(input_path))
+    if spec['output'] == 'folder':
+        return output_dir
+    base_name = os.path.splitext(os.path.basename(input_path))[0] + spec.get('suffix', '')
+    return get_unique_filename(os.path.join(output_dir, base_name), spec['ext'], taken)
+
+
+def plan_outputs(operation, input_paths, output_dir=None):
+    # Output path for every input, chosen up front so files that run side by
+    # side never pick the same name. Under output_dir each input keeps its
+    # directory relative to the inputs' common folder, so 2023/invoice.pdf and
+    # 2024/invoice.pdf (or their _pages folders) do not land on each other.
+    paths = [os.path.abspath(path) for path in input_paths]
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if paths and output_dir else None
+    outputs, taken = [], set()
+    for path in paths:
+        folder = None
+        if output_dir:
+            folder = os.path.normpath(os.path.join(output_dir, os.path.relpath(os.path.dirname(path), root)))
+        output = output_path_for(operation, path, folder, taken)
+        if OPERATIONS[operation]['output'] == 'folder':
+            # Folder operations name their results after the input, so only a
+            # second input with the same base name (a.pdf, a.PDF) needs moving.
+            base_name = os.path.splitext(os.path.basename(path))[0]
+            counter = 1
+            while (output, base_name) in taken:
+                output = os.path.join(folder or os.path.dirname(path), f"{base_name}_{counter}")
+                counter += 1
+            taken.add((output, base_name))
+        else:
+            taken.add(output)
+        outputs.append(output)
+    return outputs
+
+
+def run_operation(operation, input_path, output_dir=None, progress=None, output=None, **options):
+    # output, when given, is the path plan_outputs() reserved for this input.
+    spec = OPERATIONS[operation]
+    if spec['output'] == 'many':
+        raise PDFToolkitError(f"'{operation}' works on a list of files, call {spec['func'].__name__} directly")
+
+    if output is None:
+        output = output_path_for(operation, input_path, output_dir)
+    os.makedirs(output if spec['output'] == 'folder' else os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    func = spec['func']
+    with tracing.span(f"operation.{operation}", input=os.path.basename(input_path)):
+        if operation == 'extract':
+            return func(input_path, options.pop('pages_input'), output, progress=progress, **options)
+        return func(input_path, output, progress=progress, **options)
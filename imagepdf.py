@@ -0,0 +1,173 @@
+import io
+import os
+import tempfile
+
+import tracing
+from engine import _noop_progress, resolve_workers
+from merge import checkpoint
+from progress import Meter
+
+PAGE_SIZES = {
+    'a3': (842, 1191),
+    'a4': (595, 842),
+    'a5': (420, 595),
+    'letter': (612, 792),
+    'legal': (612, 1008),
+}
+
+# MuPDF embeds these directly: JPEG data is stored as-is (DCTDecode) and PNG data
+# is unpacked in C without a Python-side decode.
+PASSTHROUGH_FORMATS = {'JPEG': {'1', 'L', 'RGB', 'CMYK'}, 'PNG': None}
+
+EXIF_ORIENTATION = 0x0112
+# EXIF orientation -> counter-clockwise rotation for insert_image
+EXIF_ROTATION = {3: 180, 6: 270, 8: 90}
+
+CHECKPOINT_EVERY = 50
+
+
+def _flatten(img):
+    from PIL import Image
+
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert('RGB') if img.mode not in ('RGB', 'L') else img
+
+
+def prepare_image(image_file, flatten_alpha=False):
+    with tracing.span("imagepdf.prepare", file=os.path.basename(image_file)) as span:
+        prepared = _prepare_image(image_file, flatten_alpha)
+        span.set(mode=prepared['mode'])
+        return prepared
+
+
+def _prepare_image(image_file, flatten_alpha):
+    from PIL import Image
+
+    with Image.open(image_file) as img:
+        fmt = img.format
+        size = img.size
+        has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+        try:
+            orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        except Exception:
+            orientation = 1
+
+        allowed_modes = PASSTHROUGH_FORMATS.get(fmt, ())
+        passthrough = fmt in PASSTHROUGH_FORMATS and (allowed_modes is None or img.mode in allowed_modes)
+        if passthrough and not (flatten_alpha and has_alpha):
+            with open(image_file, 'rb') as f:
+                data = f.read()
+            mode = 'passthrough'
+        else:
+            img.seek(0)
+            converted = _flatten(img) if flatten_alpha else img
+            if converted.mode not in ('1', 'L', 'RGB', 'RGBA', 'LA', 'P'):
+                converted = converted.convert('RGBA' if has_alpha else 'RGB')
+            buffer = io.BytesIO()
+            converted.save(buffer, 'PNG', compress_level=6)
+            data = buffer.getvalue()
+            mode = 'decoded'
+
+    return {
+        'path': image_file,
+        'data': data,
+        'width': size[0],
+        'height': size[1],
+        'rotate': EXIF_ROTATION.get(orientation, 0),
+        'mode': mode,
+    }
+
+
+def _page_rect(width_px, height_px, page_size, dpi):
+    import pymupdf
+
+    if page_size:
+        page_width, page_height = PAGE_SIZES[page_size]
+        if width_px > height_px:
+            page_width, page_height = page_height, page_width
+        scale = min(page_width / width_px, page_height / height_px)
+        w, h = width_px * scale, height_px * scale
+        x, y = (page_width - w) / 2, (page_height - h) / 2
+        return pymupdf.Rect(0, 0, page_width, page_height), pymupdf.Rect(x, y, x + w, y + h)
+
+    w, h = width_px / dpi * 72, height_px / dpi * 72
+    rect = pymupdf.Rect(0, 0, w, h)
+    return rect, rect
+
+
+def _prepared_in_order(image_files, flatten_alpha, workers):
+    if workers == 1:
+        for image_file in image_files:
+            yield prepare_image(image_file, flatten_alpha)
+        return
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Only a small window of images is in flight so memory stays bounded by
+    # the window, not by the number of input files.
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        files = iter(image_files)
+        for image_file in files:
+            pending.append(pool.submit(prepare_image, image_file, flatten_alpha))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_pdf(image_files, output_file, page_size=None, dpi=100.0, flatten_alpha=False, workers=0,
+              checkpoint_every=CHECKPOINT_EVERY, progress=None):
+    import pymupdf
+
+    progress = progress or _noop_progress
+    progress(0, "Converting images to PDF...")
+
+    if page_size:
+        page_size = page_size.lower()
+        if page_size not in PAGE_SIZES:
+            raise ValueError(f"Unknown page size: {page_size} (choose from {', '.join(PAGE_SIZES)})")
+
+    total_images = len(image_files)
+    meter = Meter(progress, total_images, 'image')
+    workers = resolve_workers(workers, total_images, min_jobs_per_worker=4)
+    passthrough = 0
+
+    with tempfile.TemporaryDirectory(prefix="pdf_images_", dir=os.path.dirname(os.path.abspath(output_file))) as tmp:
+        doc = pymupdf.open()
+        try:
+            for i, prepared in enumerate(_prepared_in_order(image_files, flatten_alpha, workers)):
+                width, height = prepared['width'], prepared['height']
+                if prepared['rotate'] in (90, 270):
+                    width, height = height, width
+                page_rect, image_rect = _page_rect(width, height, page_size, dpi)
+                with tracing.span("imagepdf.insert", file=os.path.basename(prepared['path'])):
+                    page = doc.new_page(width=page_rect.width, height=page_rect.height)
+                    page.insert_image(image_rect, stream=prepared['data'], rotate=prepared['rotate'])
+                passthrough += prepared['mode'] == 'passthrough'
+
+                if checkpoint_every and (i + 1) % checkpoint_every == 0 and i + 1 < total_images:
+                    partial, doc = doc, None
+                    doc = checkpoint(partial, tmp, i + 1)
+                meter.update(i + 1)
+
+            if total_images:
+                with tracing.span("imagepdf.save"):
+                    doc.save(output_file, garbage=1, deflate=True)
+        finally:
+            if doc is not None:
+                doc.close()
+
+    return {
+        'output': output_file,
+        'pages': total_images,
+        'passthrough': passthrough,
+        'decoded': total_images - passthrough,
+        **meter.stats(),
+    }
@@ -1,16 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
+import base64
 import os
+import queue
 import sys
-from PIL import Image, ImageTk
-import io
-import pdfplumber
-from docx import Document
-import pandas as pd
 import threading
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-import datetime
-import pymupdf
+
+import batch
+import engine
+import pipeline
+import tables
+from cache import default_cache
+from manifest import default_manifest
+from progress import ProgressChannel
+
+PROGRESS_REFRESH_MS = 100
+PREVIEW_POLL_MS = 50
+WARM_UP_DELAY_MS = 500
+PREVIEW_LINES = 10
+THUMBNAIL_WIDTH = 160
+SEARCH_RESULTS = 20
 
 class PDFToolkitGUI:
     def __init__(self, root):
@@ -22,9 +31,23 @@ class PDFToolkitGUI:
         self.current_file = tk.StringVar()
         self.progress = tk.DoubleVar()
         self.selected_files = []
+        self.progress_channel = ProgressChannel()
+        # Bumped on every selection change; a background preview whose generation
+        # no longer matches is stale and its result is dropped.
+        self.preview_generation = 0
+        self.preview_results = queue.SimpleQueue()
+        self.preview_image = None
+        # Work finished on background threads that has to touch widgets is
+        # queued here and run by poll_progress on the Tk thread.
+        self.ui_calls = queue.SimpleQueue()
+        self.file_info = {}
         
         self.setup_ui()
         self.apply_theme()
+        self.poll_progress()
+        self.poll_preview()
+        if not os.environ.get('PDF_TOOLKIT_NO_WARMUP'):
+            self.root.after(WARM_UP_DELAY_MS, self.run_in_thread, engine.warm_up)
     
     def apply_theme(self):
         style = ttk.Style()
@@ -88,7 +111,11 @@ class PDFToolkitGUI:
             ("🔒 Protect PDF", self.protect_pdf_gui),
             ("🔓 Unlock PDF", self.unlock_pdf_gui),
             ("📏 Compress PDF", self.compress_pdf_gui),
-            ("🔄 Rotate PDF", self.rotate_pdf_gui)
+            ("🔄 Rotate PDF", self.rotate_pdf_gui),
+            ("🔎 Search PDFs", self.search_pdfs_gui),
+            ("🧪 Run Recipe", self.recipe_gui),
+            ("🔠 OCR Scans", self.ocr_pdf_gui),
+            ("🧬 Find Duplicates", self.find_duplicates_gui)
         ]
         
         row, col = 0, 0
@@ -113,8 +140,11 @@ class PDFToolkitGUI:
         preview_frame = ttk.LabelFrame(main_frame, text="👁️ Preview", padding="12")
         preview_frame.grid(row=5, column=0, columnspan=4, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(15, 0))
         
+        self.thumbnail_label = ttk.Label(preview_frame)
+        self.thumbnail_label.pack(side=tk.LEFT, anchor=tk.N, padx=(0, 10))
+
         self.preview_text = scrolledtext.ScrolledText(preview_frame, height=12, width=100, font=('Arial', 10))
-        self.preview_text.pack(fill=tk.BOTH, expand=True)
+        self.preview_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         status_frame = ttk.Frame(main_frame)
         status_frame.grid(row=6, column=0, columnspan=4, sticky=(tk.W, tk.E), pady=(10, 0))
@@ -129,25 +159,10 @@ class PDFToolkitGUI:
         self.root.rowconfigure(0, weight=1)
     
     def get_unique_filename(self, base_path, extension):
-        counter = 1
-        base_name = os.path.splitext(base_path)[0]
-        new_path = f"{base_name}{extension}"
-        
-        while os.path.exists(new_path):
-            new_path = f"{base_name}_{counter}{extension}"
-            counter += 1
-        
-        return new_path
+        return engine.get_unique_filename(base_path, extension)
 
     def get_unique_folder(self, base_folder):
-        counter = 1
-        new_folder = base_folder
-        
-        while os.path.exists(new_folder):
-            new_folder = f"{base_folder}_{counter}"
-            counter += 1
-        
-        return new_folder
+        return engine.get_unique_folder(base_folder)
 
     def browse_file(self):
         filenames = filedialog.askopenfilenames(
@@ -156,6 +171,7 @@ class PDFToolkitGUI:
         )
         if filenames:
             self.selected_files = list(filenames)
+            self.file_info = {}
             self.current_file.set(filenames[0] if filenames else "")
             self.update_file_list()
             self.update_status()
@@ -163,29 +179,56 @@ class PDFToolkitGUI:
     def browse_folder(self):
         folder = filedialog.askdirectory(title="Select folder")
         if folder:
-            pdf_files = []
-            for root_dir, dirs, files in os.walk(folder):
-                for file in files:
-                    if file.lower().endswith('.pdf'):
-                        pdf_files.append(os.path.join(root_dir, file))
-            
-            self.selected_files = pdf_files
-            self.current_file.set(folder if pdf_files else "")
-            self.update_file_list()
-            self.update_status()
+            self.current_file.set(folder)
+            self.update_progress(0, f"Scanning {folder}...")
+            self.run_in_thread(self.scan_folder_thread, folder)
+
+    def scan_folder_thread(self, folder):
+        # The listing comes first so the file list fills in straight away; page
+        # counts and hashes for new or changed files follow.
+        try:
+            manifest = default_manifest()
+            summary = manifest.scan(folder, details=False)
+            self.ui_calls.put((self.show_folder, (folder, summary['files'], {})))
+            self.update_progress(0, f"Found {len(summary['files'])} PDFs "
+                                    f"({summary['added']} new, {summary['changed']} changed)")
+            manifest.fill_details(folder, progress=self.update_progress)
+            info = {entry['path']: entry for entry in manifest.entries(folder)}
+            self.ui_calls.put((self.show_folder, (folder, summary['files'], info)))
+            self.update_progress(100, f"✅ {len(summary['files'])} PDFs in {os.path.basename(folder) or folder}")
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"Folder scan failed: {str(e)}")
+
+    def show_folder(self, folder, files, info):
+        if self.current_file.get() != folder:
+            return
+        self.selected_files = files
+        self.file_info = info
+        if not files:
+            self.current_file.set("")
+        self.update_file_list()
+        self.update_status()
 
     def preview_selected(self):
         if self.selected_files:
             self.update_preview(self.selected_files[0])
 
     def update_file_list(self):
+        self.cancel_preview()
         self.file_list_text.config(state=tk.NORMAL)
         self.file_list_text.delete(1.0, tk.END)
         if self.selected_files:
             for f in self.selected_files[:10]:
                 name = os.path.basename(f)
-                size = os.path.getsize(f) / 1024
-                self.file_list_text.insert(tk.END, f"• {name} ({size:.1f} KB)\n")
+                entry = self.file_info.get(f)
+                size = (entry['size'] if entry else os.path.getsize(f)) / 1024
+                details = f"{size:.1f} KB"
+                if entry and entry['pages'] is not None:
+                    details += f", {entry['pages']} page{'s' if entry['pages'] != 1 else ''}"
+                if entry and entry['encrypted']:
+                    details += ", 🔒"
+                self.file_list_text.insert(tk.END, f"• {name} ({details})\n")
             if len(self.selected_files) > 10:
                 self.file_list_text.insert(tk.END, f"... and {len(self.selected_files) - 10} more files")
         else:
@@ -194,40 +237,81 @@ class PDFToolkitGUI:
 
     def clear_files(self):
         self.selected_files = []
+        self.file_info = {}
         self.current_file.set("")
         self.update_file_list()
-        self.preview_text.delete(1.0, tk.END)
         self.update_status()
 
+    def cancel_preview(self):
+        self.preview_generation += 1
+        self.show_preview("", None)
+
     def update_preview(self, filename):
+        self.cancel_preview()
+        if not filename.lower().endswith('.pdf'):
+            return
+        generation = self.preview_generation
+        self.show_preview(f"⏳ Loading preview of {os.path.basename(filename)}...", None)
+        self.run_in_thread(self.load_preview, filename, generation)
+
+    def load_preview(self, filename, generation):
         try:
-            if filename.lower().endswith('.pdf'):
-                with pdfplumber.open(filename) as pdf:
-                    preview_text = f"📄 {os.path.basename(filename)}\n"
-                    preview_text += f"📏 Size: {os.path.getsize(filename)/1024:.1f} KB\n"
-                    preview_text += f"📑 Pages: {len(pdf.pages)}\n"
-                    preview_text += "─" * 50 + "\n\n"
-                    
-                    if len(pdf.pages) > 0:
-                        first_page = pdf.pages[0]
-                        text = first_page.extract_text()
-                        if text:
-                            lines = text.split('\n')[:10]
-                            preview_text += '\n'.join(lines)
-                            if len(text.split('\n')) > 10:
-                                preview_text += "\n\n... (more content)"
-                    
-                    self.preview_text.delete(1.0, tk.END)
-                    self.preview_text.insert(1.0, preview_text)
+            result = engine.preview_pdf(filename, PREVIEW_LINES, THUMBNAIL_WIDTH, cache=default_cache(),
+                                        is_cancelled=lambda: generation != self.preview_generation)
+            if result is not None:
+                self.preview_results.put((generation, filename, result, None))
         except Exception as e:
-            self.preview_text.delete(1.0, tk.END)
-            self.preview_text.insert(1.0, f"⚠️ Preview error: {str(e)}")
+            self.preview_results.put((generation, filename, None, e))
+
+    def poll_preview(self):
+        # Tk widgets are only touched here, on the Tk thread.
+        while True:
+            try:
+                generation, filename, result, error = self.preview_results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.preview_generation:
+                continue
+            if error is not None:
+                self.show_preview(f"⚠️ Preview error: {str(error)}", None)
+                continue
+
+            preview_text = f"📄 {os.path.basename(filename)}\n"
+            preview_text += f"📏 Size: {os.path.getsize(filename)/1024:.1f} KB\n"
+            preview_text += f"📑 Pages: {result['pages']}\n"
+            preview_text += "─" * 50 + "\n\n"
+            if result['encrypted']:
+                preview_text += "🔒 Password protected"
+            elif result['lines']:
+                preview_text += '\n'.join(result['lines'])
+                if result['more']:
+                    preview_text += "\n\n... (more content)"
+            self.show_preview(preview_text, result['thumbnail'])
+        self.root.after(PREVIEW_POLL_MS, self.poll_preview)
+
+    def show_preview(self, text, thumbnail):
+        self.preview_text.delete(1.0, tk.END)
+        self.preview_text.insert(1.0, text)
+        self.preview_image = tk.PhotoImage(data=base64.b64encode(thumbnail)) if thumbnail else None
+        self.thumbnail_label.config(image=self.preview_image or '')
 
     def update_progress(self, value, text=""):
-        self.progress.set(value)
-        if text:
-            self.progress_label.config(text=text)
-        self.root.update_idletasks()
+        self.progress_channel(value, text)
+
+    def poll_progress(self):
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        event = self.progress_channel.drain()
+        if event is not None:
+            value, text = event
+            self.progress.set(value)
+            if text:
+                self.progress_label.config(text=text)
+        self.root.after(PROGRESS_REFRESH_MS, self.poll_progress)
 
     def update_status(self):
         count = len(self.selected_files)
@@ -239,6 +323,107 @@ class PDFToolkitGUI:
         thread.daemon = True
         thread.start()
 
+    def is_batch(self):
+        return len(self.selected_files) > 1
+
+    def ask_output_file(self, **kwargs):
+        if self.is_batch():
+            return filedialog.askdirectory(title=f"Select output folder for {len(self.selected_files)} files")
+        return filedialog.asksaveasfilename(**kwargs)
+
+    def batch_thread(self, operation, output_folder, options):
+        try:
+            summary = batch.run_batch(operation, self.selected_files, output_folder,
+                                      progress=self.update_progress, **options)
+            message = (f"{summary['succeeded']}/{summary['total']} files processed in {summary['elapsed']:.1f}s\n"
+                       f"Report: {summary['report']}")
+            failures = [r for r in summary['results'] if not r['ok']]
+            if failures:
+                message += "\n\nFailed:\n" + "\n".join(
+                    f"• {os.path.basename(r['input'])}: {r['error']}" for r in failures[:10]
+                )
+                if len(failures) > 10:
+                    message += f"\n... and {len(failures) - 10} more"
+            self.update_progress(100, f"✅ Batch completed: {summary['succeeded']}/{summary['total']} files")
+            messagebox.showinfo("Batch Complete", message)
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"Batch failed: {str(e)}")
+
+    def search_pdfs_gui(self):
+        query = simpledialog.askstring(
+            "Search PDFs",
+            "Words to find (put a phrase in \"quotes\").\nSelected files are indexed first; unchanged files are skipped.",
+        )
+        if not query or not query.strip():
+            return
+        self.run_in_thread(self.search_pdfs_thread, query, list(self.selected_files))
+
+    def search_pdfs_thread(self, query, files):
+        try:
+            if files:
+                summary = engine.index_pdfs(files, progress=self.update_progress)
+                self.update_progress(100, f"Indexed {summary['indexed']} files, {summary['unchanged']} unchanged")
+            hits = engine.search_pdfs(query, limit=SEARCH_RESULTS)
+            self.update_progress(100, f"✅ {len(hits)} matching page{'s' if len(hits) != 1 else ''}")
+            if not hits:
+                messagebox.showinfo("Search PDFs", f"No indexed page contains: {query}")
+                return
+            message = "\n\n".join(f"• {os.path.basename(hit['path'])}, page {hit['page']}\n   {hit['snippet']}"
+                                   for hit in hits)
+            messagebox.showinfo("Search PDFs", message)
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"Search failed: {str(e)}")
+
+    def find_duplicates_gui(self):
+        if len(self.selected_files) < 2:
+            messagebox.showwarning("Find Duplicates", "Select at least 2 PDF files, or a folder")
+            return
+        self.run_in_thread(self.find_duplicates_thread, list(self.selected_files))
+
+    def find_duplicates_thread(self, files):
+        try:
+            report = engine.find_duplicates(files, progress=self.update_progress)
+            duplicates = sum(len(group['duplicates']) for group in report['duplicate_files'])
+            self.update_progress(100, f"✅ {duplicates} duplicate files, "
+                                      f"{len(report['duplicate_pages'])} duplicate page pairs")
+            self.ui_calls.put((self.drop_duplicates, (report,)))
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"Duplicate search failed: {str(e)}")
+
+    def drop_duplicates(self, report):
+        # Runs on the Tk thread: it changes the selection.
+        groups = report['duplicate_files']
+        if not groups:
+            messagebox.showinfo("Find Duplicates", f"No duplicate files among {report['files']} PDFs "
+                                                   f"({len(report['duplicate_pages'])} duplicate page pairs)")
+            return
+        lines = []
+        for group in groups[:10]:
+            lines.append(f"• {os.path.basename(group['keep'])} = "
+                         + ", ".join(os.path.basename(path) for path in group['duplicates']))
+        if len(groups) > 10:
+            lines.append(f"... and {len(groups) - 10} more groups")
+        duplicates = {os.path.abspath(path) for group in groups for path in group['duplicates']}
+        if messagebox.askyesno("Find Duplicates", "\n".join(lines)
+                               + f"\n\nRemove the {len(duplicates)} duplicates from the selection?"):
+            self.selected_files = [path for path in self.selected_files if os.path.abspath(path) not in duplicates]
+            self.current_file.set(self.selected_files[0] if self.selected_files else "")
+            self.update_file_list()
+            self.update_status()
+
+    def ask_ocr_options(self, title):
+        # {} when OCR is off, otherwise the engine keyword arguments for it
+        if not messagebox.askyesno(title, "Recognise scanned pages that have no text (OCR, needs Tesseract)?"):
+            return {}
+        dpi = simpledialog.askinteger(title, "OCR resolution in DPI (150-600):", minvalue=150, maxvalue=600,
+                                      initialvalue=300)
+        if not dpi:
+            return {}
+        return {'ocr': True, 'ocr_dpi': dpi}
+
     def validate_pdf_file(self):
         if not self.selected_files:
             messagebox.showwarning("No File", "Please select a PDF file first")
@@ -249,48 +434,44 @@ class PDFToolkitGUI:
         if not self.validate_pdf_file():
             return
         
-        dpi = simpledialog.askinteger("Image Quality", "Enter DPI (72-300):", minvalue=72, maxvalue=300, initialvalue=150)
+        dpi = simpledialog.askinteger("Image Quality", "Enter DPI (72-600):", minvalue=72, maxvalue=600, initialvalue=150)
         if not dpi:
             return
         
-        fmt = simpledialog.askstring("Image Format", "Enter format (png/jpg):", initialvalue="png")
-        if not fmt or fmt.lower() not in ['png', 'jpg', 'jpeg']:
-            messagebox.showerror("Error", "Format must be png or jpg")
+        fmt = simpledialog.askstring("Image Format", "Enter format (png/jpg/webp):", initialvalue="png")
+        if not fmt or fmt.lower() not in ['png', 'jpg', 'jpeg', 'webp']:
+            messagebox.showerror("Error", "Format must be png, jpg or webp")
             return
+        fmt = fmt.lower()
+        
+        options = {'dpi': dpi, 'fmt': fmt}
+        if fmt != 'png':
+            quality = simpledialog.askinteger("Image Quality", f"{fmt.upper()} quality (1-100):", minvalue=1,
+                                              maxvalue=100, initialvalue=85)
+            if not quality:
+                return
+            options['quality'] = quality
+        options['pyramid'] = messagebox.askyesno(
+            "Image Layout",
+            "Write a zoomable tile pyramid (Deep Zoom) for each page?\n\nChoose No for one image per page."
+        )
         
         output_folder = filedialog.askdirectory(title="Select output folder")
         if not output_folder:
             return
         
-        self.run_in_thread(self.pdf_to_images_thread, self.selected_files[0], output_folder, dpi, fmt.lower())
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'images', output_folder, options)
+        else:
+            self.run_in_thread(self.pdf_to_images_thread, self.selected_files[0], output_folder, options)
 
-    def pdf_to_images_thread(self, pdf_path, output_folder, dpi, fmt):
+    def pdf_to_images_thread(self, pdf_path, output_folder, options):
+        fmt = options['fmt']
         try:
-            self.update_progress(0, "Converting PDF to images...")
-            
-            doc = pymupdf.open(pdf_path)
-            total_pages = len(doc)
-            zoom = dpi / 72
-            
-            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            image_folder = os.path.join(output_folder, f"{base_name}_images")
-            os.makedirs(image_folder, exist_ok=True)
-            
-            for page_num in range(total_pages):
-                page = doc[page_num]
-                mat = pymupdf.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat)
-                
-                image_filename = f"page_{page_num + 1:03d}.{fmt}"
-                output_path = os.path.join(image_folder, image_filename)
-                pix.save(output_path)
-                
-                progress = (page_num + 1) / total_pages * 100
-                self.update_progress(progress, f"Processed page {page_num + 1}/{total_pages}")
-            
-            doc.close()
+            result = engine.pdf_to_images(pdf_path, output_folder, workers=0, progress=self.update_progress,
+                                          **options)
             self.update_progress(100, "✅ Conversion completed!")
-            messagebox.showinfo("Success", f"PDF converted to {fmt.upper()} images in {image_folder}")
+            messagebox.showinfo("Success", f"PDF converted to {fmt.upper()} images in {result['output']}")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
             messagebox.showerror("Error", f"Conversion failed: {str(e)}")
@@ -299,39 +480,29 @@ class PDFToolkitGUI:
         if not self.validate_pdf_file():
             return
         
-        output_file = filedialog.asksaveasfilename(
+        output_file = self.ask_output_file(
             defaultextension=".docx",
             filetypes=[("Word files", "*.docx"), ("All files", "*.*")]
         )
         if not output_file:
             return
+
+        layout = messagebox.askyesno(
+            "PDF to Word",
+            "Keep the layout (headings, tables and images)?\n\nChoose No for plain text, one paragraph per page."
+        )
+        ocr_options = self.ask_ocr_options("PDF to Word")
         
-        self.run_in_thread(self.pdf_to_word_thread, self.selected_files[0], output_file)
+        if self.is_batch():
+            options = {'layout': layout, 'cache': default_cache(), **ocr_options}
+            self.run_in_thread(self.batch_thread, 'word', output_file, options)
+        else:
+            self.run_in_thread(self.pdf_to_word_thread, self.selected_files[0], output_file, layout, ocr_options)
 
-    def pdf_to_word_thread(self, pdf_path, output_file):
+    def pdf_to_word_thread(self, pdf_path, output_file, layout=True, ocr_options=None):
         try:
-            self.update_progress(0, "Converting PDF to Word...")
-            
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                doc = Document()
-                
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        doc.add_paragraph(text)
-                    
-                    if i == 0:
-                        metadata = pdf.metadata
-                        if metadata:
-                            doc.core_properties.title = metadata.get('Title', '')
-                            doc.core_properties.author = metadata.get('Author', '')
-                    
-                    progress = (i + 1) / total_pages * 100
-                    self.update_progress(progress, f"Processed page {i + 1}/{total_pages}")
-                
-                doc.save(output_file)
-            
+            engine.pdf_to_word(pdf_path, output_file, layout, cache=default_cache(), progress=self.update_progress,
+                               **(ocr_options or {}))
             self.update_progress(100, "✅ Conversion completed!")
             messagebox.showinfo("Success", f"PDF converted to Word: {output_file}")
         except Exception as e:
@@ -346,53 +517,42 @@ class PDFToolkitGUI:
         if not output_folder:
             return
         
-        self.run_in_thread(self.extract_tables_thread, self.selected_files[0], output_folder)
+        fast = messagebox.askyesno(
+            "Table Detection",
+            "Use fast table detection (PyMuPDF)?\nChoose No for pdfplumber."
+        )
+        backend = 'pymupdf' if fast else 'pdfplumber'
+        
+        formats = simpledialog.askstring(
+            "Output Format",
+            "Enter output formats (csv, xlsx, parquet):",
+            initialvalue="csv,xlsx"
+        )
+        if not formats:
+            return
+        try:
+            formats = tables.parse_formats(formats)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        ocr_options = self.ask_ocr_options("Extract Tables")
+        
+        if self.is_batch():
+            options = {'backend': backend, 'formats': formats, 'cache': default_cache(), **ocr_options}
+            self.run_in_thread(self.batch_thread, 'tables', output_folder, options)
+        else:
+            self.run_in_thread(self.extract_tables_thread, self.selected_files[0], output_folder, backend, formats,
+                               ocr_options)
 
-    def extract_tables_thread(self, pdf_path, output_folder):
+    def extract_tables_thread(self, pdf_path, output_folder, backend='pdfplumber', formats=('csv', 'xlsx'),
+                              ocr_options=None):
         try:
-            self.update_progress(0, "Extracting tables from PDF...")
-            
-            all_tables = []
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                
-                for page_num, page in enumerate(pdf.pages):
-                    tables = page.extract_tables()
-                    
-                    for table_num, table_data in enumerate(tables):
-                        if table_data:
-                            df = pd.DataFrame(table_data)
-                            df = df.dropna(how='all').dropna(axis=1, how='all')
-                            
-                            if not df.empty:
-                                all_tables.append({
-                                    'page': page_num + 1,
-                                    'table_num': table_num + 1,
-                                    'dataframe': df
-                                })
-                    
-                    progress = (page_num + 1) / total_pages * 100
-                    self.update_progress(progress, f"Processed page {page_num + 1}/{total_pages}")
-            
-            if all_tables:
-                base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-                table_folder = os.path.join(output_folder, f"{base_name}_tables")
-                os.makedirs(table_folder, exist_ok=True)
-                
-                with pd.ExcelWriter(os.path.join(table_folder, "all_tables.xlsx")) as writer:
-                    for table_info in all_tables:
-                        df = table_info['dataframe']
-                        page = table_info['page']
-                        table_num = table_info['table_num']
-                        
-                        sheet_name = f"Page_{page}_T{table_num}"[:31]
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        
-                        csv_file = os.path.join(table_folder, f"table_p{page}_t{table_num}.csv")
-                        df.to_csv(csv_file, index=False, encoding='utf-8')
-                
-                self.update_progress(100, f"✅ Extracted {len(all_tables)} tables!")
-                messagebox.showinfo("Success", f"Extracted {len(all_tables)} tables to {table_folder}")
+            result = engine.extract_tables(pdf_path, output_folder, backend, workers=0, formats=formats,
+                                           cache=default_cache(), progress=self.update_progress,
+                                           **(ocr_options or {}))
+            if result['tables']:
+                self.update_progress(100, f"✅ Extracted {result['tables']} tables!")
+                messagebox.showinfo("Success", f"Extracted {result['tables']} tables to {result['output']}")
             else:
                 self.update_progress(100, "ℹ️ No tables found")
                 messagebox.showinfo("Info", "No tables found in the PDF")
@@ -404,7 +564,7 @@ class PDFToolkitGUI:
         if not self.validate_pdf_file():
             return
         
-        output_file = filedialog.asksaveasfilename(
+        output_file = self.ask_output_file(
             defaultextension=".txt",
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
         )
@@ -412,38 +572,29 @@ class PDFToolkitGUI:
             return
         
         include_metadata = messagebox.askyesno("Include Metadata", "Include PDF metadata in output?")
+        fast = messagebox.askyesno(
+            "Extraction Engine",
+            "Use fast extraction (PyMuPDF)?\nChoose No for pdfplumber's layout-based text."
+        )
+        backend = 'pymupdf' if fast else 'pdfplumber'
+        ocr_options = self.ask_ocr_options("PDF to Text")
         
-        self.run_in_thread(self.pdf_to_text_thread, self.selected_files[0], output_file, include_metadata)
+        if self.is_batch():
+            options = {'include_metadata': include_metadata, 'backend': backend, 'cache': default_cache(),
+                       **ocr_options}
+            self.run_in_thread(self.batch_thread, 'text', output_file, options)
+        else:
+            self.run_in_thread(self.pdf_to_text_thread, self.selected_files[0], output_file, include_metadata, backend,
+                               ocr_options)
 
-    def pdf_to_text_thread(self, pdf_path, output_file, include_metadata):
+    def pdf_to_text_thread(self, pdf_path, output_file, include_metadata, backend='pdfplumber', ocr_options=None):
         try:
-            self.update_progress(0, "Extracting text from PDF...")
-            
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                all_text = []
-                
-                if include_metadata:
-                    metadata = pdf.metadata
-                    if metadata:
-                        all_text.append("=== PDF METADATA ===\n")
-                        for key, value in metadata.items():
-                            all_text.append(f"{key}: {value}\n")
-                        all_text.append("\n")
-                
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        all_text.append(f"\n=== Page {i+1} ===\n\n")
-                        all_text.append(text)
-                    
-                    progress = (i + 1) / total_pages * 100
-                    self.update_progress(progress, f"Processed page {i + 1}/{total_pages}")
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.writelines(all_text)
-            
-            self.update_progress(100, "✅ Text extraction completed!")
+            result = engine.pdf_to_text(pdf_path, output_file, include_metadata, backend, workers=0,
+                                        cache=default_cache(), progress=self.update_progress, **(ocr_options or {}))
+            if result['ocr_pages']:
+                self.update_progress(100, f"✅ Text extraction completed ({len(result['ocr_pages'])} pages by OCR)")
+            else:
+                self.update_progress(100, "✅ Text extraction completed!")
             messagebox.showinfo("Success", f"Text extracted to: {output_file}")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
@@ -452,7 +603,7 @@ class PDFToolkitGUI:
     def images_to_pdf_gui(self):
         image_files = filedialog.askopenfilenames(
             title="Select images to convert to PDF",
-            filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff *.gif")]
+            filetypes=[("Image files", "*.png *.jpg *.jpeg *.bmp *.tiff *.tif *.gif *.webp")]
         )
         if not image_files:
             return
@@ -464,31 +615,26 @@ class PDFToolkitGUI:
         if not output_file:
             return
         
-        self.run_in_thread(self.images_to_pdf_thread, image_files, output_file)
+        page_size = simpledialog.askstring(
+            "Images to PDF",
+            "Page size (a3 / a4 / a5 / letter / legal), or leave empty to size pages from the image DPI:",
+            initialvalue=""
+        )
+        if page_size is None:
+            return
+        page_size = page_size.strip().lower() or None
+        dpi = 100
+        if page_size is None:
+            dpi = simpledialog.askinteger("Images to PDF", "Image DPI (72-600):", minvalue=72, maxvalue=600,
+                                          initialvalue=100)
+            if not dpi:
+                return
+
+        self.run_in_thread(self.images_to_pdf_thread, image_files, output_file, page_size, dpi)
 
-    def images_to_pdf_thread(self, image_files, output_file):
+    def images_to_pdf_thread(self, image_files, output_file, page_size=None, dpi=100):
         try:
-            self.update_progress(0, "Converting images to PDF...")
-            
-            images = []
-            total_images = len(image_files)
-            
-            for i, image_file in enumerate(image_files):
-                img = Image.open(image_file)
-                if img.mode in ['RGBA', 'LA']:
-                    rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                    rgb_img.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else img.split()[-1])
-                    img = rgb_img
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                images.append(img)
-                
-                progress = (i + 1) / total_images * 100
-                self.update_progress(progress, f"Processed image {i + 1}/{total_images}")
-            
-            if images:
-                images[0].save(output_file, save_all=True, append_images=images[1:], resolution=100.0)
-            
+            engine.images_to_pdf(image_files, output_file, page_size, dpi, progress=self.update_progress)
             self.update_progress(100, "✅ PDF created successfully!")
             messagebox.showinfo("Success", f"PDF created: {output_file}")
         except Exception as e:
@@ -515,23 +661,13 @@ class PDFToolkitGUI:
         if not output_file:
             return
         
-        self.run_in_thread(self.merge_pdfs_thread, files_to_merge, output_file)
+        file_bookmarks = messagebox.askyesno("Merge PDFs", "Add a bookmark for each merged file?")
+        
+        self.run_in_thread(self.merge_pdfs_thread, files_to_merge, output_file, file_bookmarks)
 
-    def merge_pdfs_thread(self, pdf_files, output_file):
+    def merge_pdfs_thread(self, pdf_files, output_file, file_bookmarks=False):
         try:
-            self.update_progress(0, "Merging PDFs...")
-            
-            merger = PdfMerger()
-            total_files = len(pdf_files)
-            
-            for i, pdf_file in enumerate(pdf_files):
-                merger.append(pdf_file)
-                progress = (i + 1) / total_files * 100
-                self.update_progress(progress, f"Merged {i + 1}/{total_files} files")
-            
-            merger.write(output_file)
-            merger.close()
-            
+            engine.merge_pdfs(pdf_files, output_file, file_bookmarks, progress=self.update_progress)
             self.update_progress(100, "✅ PDFs merged successfully!")
             messagebox.showinfo("Success", f"PDFs merged into: {output_file}")
         except Exception as e:
@@ -543,37 +679,47 @@ class PDFToolkitGUI:
             return
         
         pdf_path = self.selected_files[0]
+        mode = simpledialog.askstring(
+            "Split PDF",
+            "Split mode (pages / bookmarks / size):",
+            initialvalue="pages"
+        )
+        if not mode:
+            return
+        mode = mode.strip().lower()
+        
+        options = {'mode': mode}
+        if mode == 'pages':
+            every = simpledialog.askinteger("Split PDF", "Pages per file:", minvalue=1, initialvalue=1)
+            if not every:
+                return
+            options['every'] = every
+            pages = simpledialog.askstring("Split PDF", "Pages to split (leave empty for all pages):")
+            if pages:
+                options['pages'] = pages
+        elif mode == 'size':
+            max_size_mb = simpledialog.askfloat("Split PDF", "Maximum file size (MB):", minvalue=0.1, initialvalue=10)
+            if not max_size_mb:
+                return
+            options['max_size_mb'] = max_size_mb
+        elif mode != 'bookmarks':
+            messagebox.showerror("Error", "Mode must be pages, bookmarks or size")
+            return
+        
         output_folder = filedialog.askdirectory(title="Select output folder")
         if not output_folder:
             return
         
-        self.run_in_thread(self.split_pdf_thread, pdf_path, output_folder)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'split', output_folder, options)
+        else:
+            self.run_in_thread(self.split_pdf_thread, pdf_path, output_folder, options)
 
-    def split_pdf_thread(self, pdf_path, output_folder):
+    def split_pdf_thread(self, pdf_path, output_folder, options=None):
         try:
-            self.update_progress(0, "Splitting PDF...")
-            
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                total_pages = len(reader.pages)
-                
-                base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-                split_folder = os.path.join(output_folder, f"{base_name}_pages")
-                os.makedirs(split_folder, exist_ok=True)
-                
-                for i in range(total_pages):
-                    writer = PdfWriter()
-                    writer.add_page(reader.pages[i])
-                    
-                    output_file = os.path.join(split_folder, f"page_{i+1:03d}.pdf")
-                    with open(output_file, 'wb') as output_pdf:
-                        writer.write(output_pdf)
-                    
-                    progress = (i + 1) / total_pages * 100
-                    self.update_progress(progress, f"Split page {i + 1}/{total_pages}")
-            
+            result = engine.split_pdf(pdf_path, output_folder, progress=self.update_progress, **(options or {}))
             self.update_progress(100, "✅ PDF split successfully!")
-            messagebox.showinfo("Success", f"PDF split into {total_pages} pages in {split_folder}")
+            messagebox.showinfo("Success", f"PDF split into {len(result['files'])} files in {result['output']}")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
             messagebox.showerror("Error", f"Split failed: {str(e)}")
@@ -582,67 +728,36 @@ class PDFToolkitGUI:
         if not self.validate_pdf_file():
             return
         
-        with pdfplumber.open(self.selected_files[0]) as pdf:
-            total_pages = len(pdf.pages)
+        total_pages = engine.page_count(self.selected_files[0], cache=default_cache())
         
         pages_input = simpledialog.askstring(
             "Extract Pages", 
-            f"Enter page numbers (1-{total_pages})\nExamples: 1,3,5 or 2-7 or 1,3-5,8:"
+            f"Enter page numbers (1-{total_pages})\nExamples: 1,3,5 or 2-7 or 10- or -1 (last) or odd:"
         )
         if not pages_input:
             return
         
-        output_file = filedialog.asksaveasfilename(
+        output_file = self.ask_output_file(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
         )
         if not output_file:
             return
         
-        self.run_in_thread(self.extract_pages_thread, self.selected_files[0], pages_input, output_file)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'extract', output_file, {'pages_input': pages_input})
+        else:
+            self.run_in_thread(self.extract_pages_thread, self.selected_files[0], pages_input, output_file)
 
     def extract_pages_thread(self, pdf_path, pages_input, output_file):
         try:
-            self.update_progress(0, "Extracting pages...")
-            
-            page_ranges = self.parse_page_ranges(pages_input)
-            
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                writer = PdfWriter()
-                
-                total_pages = len(page_ranges)
-                for i, page_num in enumerate(page_ranges):
-                    if 1 <= page_num <= len(reader.pages):
-                        writer.add_page(reader.pages[page_num - 1])
-                    
-                    progress = (i + 1) / total_pages * 100
-                    self.update_progress(progress, f"Extracted page {i + 1}/{total_pages}")
-                
-                with open(output_file, 'wb') as output_pdf:
-                    writer.write(output_pdf)
-            
+            engine.extract_pages(pdf_path, pages_input, output_file, progress=self.update_progress)
             self.update_progress(100, "✅ Pages extracted successfully!")
             messagebox.showinfo("Success", f"Pages extracted to: {output_file}")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
             messagebox.showerror("Error", f"Extraction failed: {str(e)}")
 
-    def parse_page_ranges(self, pages_input):
-        pages = []
-        for part in pages_input.replace(' ', '').split(','):
-            if '-' in part:
-                start_end = part.split('-')
-                if len(start_end) == 2:
-                    start, end = map(int, start_end)
-                    pages.extend(range(start, end + 1))
-            else:
-                try:
-                    pages.append(int(part))
-                except ValueError:
-                    continue
-        return sorted(set(pages))
-
     def protect_pdf_gui(self):
         if not self.validate_pdf_file():
             return
@@ -656,31 +771,21 @@ class PDFToolkitGUI:
             messagebox.showerror("Error", "Passwords don't match")
             return
         
-        output_file = filedialog.asksaveasfilename(
+        output_file = self.ask_output_file(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
         )
         if not output_file:
             return
         
-        self.run_in_thread(self.protect_pdf_thread, self.selected_files[0], output_file, password)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'protect', output_file, {'password': password})
+        else:
+            self.run_in_thread(self.protect_pdf_thread, self.selected_files[0], output_file, password)
 
     def protect_pdf_thread(self, pdf_path, output_file, password):
         try:
-            self.update_progress(0, "Protecting PDF...")
-            
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                writer = PdfWriter()
-                
-                for page in reader.pages:
-                    writer.add_page(page)
-                
-                writer.encrypt(password)
-                
-                with open(output_file, 'wb') as output_pdf:
-                    writer.write(output_pdf)
-            
+            engine.protect_pdf(pdf_path, output_file, password, progress=self.update_progress)
             self.update_progress(100, "✅ PDF protected successfully!")
             messagebox.showinfo("Success", f"Protected PDF saved: {output_file}")
         except Exception as e:
@@ -695,40 +800,29 @@ class PDFToolkitGUI:
         if not password:
             return
         
-        output_file = filedialog.asksaveasfilename(
+        output_file = self.ask_output_file(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
         )
         if not output_file:
             return
         
-        self.run_in_thread(self.unlock_pdf_thread, self.selected_files[0], output_file, password)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'unlock', output_file, {'password': password})
+        else:
+            self.run_in_thread(self.unlock_pdf_thread, self.selected_files[0], output_file, password)
 
     def unlock_pdf_thread(self, pdf_path, output_file, password):
         try:
-            self.update_progress(0, "Unlocking PDF...")
-            
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                
-                if reader.is_encrypted:
-                    if reader.decrypt(password):
-                        writer = PdfWriter()
-                        
-                        for page in reader.pages:
-                            writer.add_page(page)
-                        
-                        with open(output_file, 'wb') as output_pdf:
-                            writer.write(output_pdf)
-                        
-                        self.update_progress(100, "✅ PDF unlocked successfully!")
-                        messagebox.showinfo("Success", f"Unlocked PDF saved: {output_file}")
-                    else:
-                        self.update_progress(0, "❌ Incorrect password")
-                        messagebox.showerror("Error", "Incorrect password")
-                else:
-                    self.update_progress(0, "❌ PDF is not encrypted")
-                    messagebox.showinfo("Info", "PDF is not encrypted")
+            engine.unlock_pdf(pdf_path, output_file, password, progress=self.update_progress)
+            self.update_progress(100, "✅ PDF unlocked successfully!")
+            messagebox.showinfo("Success", f"Unlocked PDF saved: {output_file}")
+        except engine.IncorrectPasswordError:
+            self.update_progress(0, "❌ Incorrect password")
+            messagebox.showerror("Error", "Incorrect password")
+        except engine.NotEncryptedError:
+            self.update_progress(0, "❌ PDF is not encrypted")
+            messagebox.showinfo("Info", "PDF is not encrypted")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
             messagebox.showerror("Error", f"Unlock failed: {str(e)}")
@@ -747,39 +841,40 @@ class PDFToolkitGUI:
         if not quality:
             return
         
-        output_file = filedialog.asksaveasfilename(
+        target_dpi = simpledialog.askinteger(
+            "Compress PDF",
+            "Downsample images above this DPI (72-600):",
+            minvalue=72,
+            maxvalue=600,
+            initialvalue=150
+        )
+        if not target_dpi:
+            return
+        
+        output_file = self.ask_output_file(
             defaultextension=".pdf",
             filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
         )
         if not output_file:
             return
         
-        self.run_in_thread(self.compress_pdf_thread, self.selected_files[0], output_file, quality)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'compress', output_file, {'quality': quality, 'target_dpi': target_dpi})
+        else:
+            self.run_in_thread(self.compress_pdf_thread, self.selected_files[0], output_file, quality, target_dpi)
 
-    def compress_pdf_thread(self, pdf_path, output_file, quality):
+    def compress_pdf_thread(self, pdf_path, output_file, quality, target_dpi=150):
         try:
-            self.update_progress(0, "Compressing PDF...")
-            
-            original_size = os.path.getsize(pdf_path) / 1024
-            
-            doc = pymupdf.open(pdf_path)
-            
-            for page in doc:
-                page.get_pixmap(dpi=72 * quality / 100)
-            
-            doc.save(output_file, garbage=4, deflate=True, clean=True)
-            doc.close()
-            
-            new_size = os.path.getsize(output_file) / 1024
-            reduction = ((original_size - new_size) / original_size) * 100
-            
+            result = engine.compress_pdf(pdf_path, output_file, quality, target_dpi, progress=self.update_progress)
             self.update_progress(100, f"✅ Compression completed!")
             messagebox.showinfo(
                 "Success", 
                 f"Compressed PDF saved: {output_file}\n"
-                f"Original: {original_size:.1f} KB\n"
-                f"Compressed: {new_size:.1f} KB\n"
-                f"Reduction: {reduction:.1f}%"
+                f"Original: {result['original_size']:.1f} KB\n"
+                f"Compressed: {result['new_size']:.1f} KB\n"
+                f"Reduction: {result['reduction']:.1f}%\n"
+                f"Images recompressed: {result['images_recompressed']}, "
+                f"duplicates removed: {result['duplicates_removed']}"
             )
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
@@ -799,57 +894,159 @@ class PDFToolkitGUI:
         if angle is None:
             return
         
-        output_file = filedialog.asksaveasfilename(
-            defaultextension=".pdf",
-            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        # In place only appends the changed pages, so even a huge file takes
+        # moments; a copy has to write the whole file first.
+        in_place = messagebox.askyesno(
+            "Rotate PDF",
+            "Rotate the original file in place?\n"
+            "This is fastest for large files. Choose No to save a rotated copy."
         )
-        if not output_file:
-            return
+        output_file = None
+        if not in_place:
+            output_file = self.ask_output_file(
+                defaultextension=".pdf",
+                filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+            )
+            if not output_file:
+                return
         
         pages_input = simpledialog.askstring(
             "Rotate Pages", 
-            "Enter page numbers to rotate (leave empty for all pages):"
+            "Enter page numbers to rotate (leave empty for all pages)\nExamples: 1-3 or odd or -1 (last):"
         )
         
-        self.run_in_thread(self.rotate_pdf_thread, self.selected_files[0], output_file, angle, pages_input)
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'rotate', output_file,
+                               {'angle': angle, 'pages_input': pages_input, 'in_place': in_place})
+        else:
+            self.run_in_thread(self.rotate_pdf_thread, self.selected_files[0], output_file, angle, pages_input,
+                               in_place)
 
-    def rotate_pdf_thread(self, pdf_path, output_file, angle, pages_input):
+    def rotate_pdf_thread(self, pdf_path, output_file, angle, pages_input, in_place=False):
         try:
-            self.update_progress(0, "Rotating PDF...")
-            
-            with open(pdf_path, 'rb') as file:
-                reader = PdfReader(file)
-                writer = PdfWriter()
-                
-                if pages_input:
-                    pages_to_rotate = self.parse_page_ranges(pages_input)
-                else:
-                    pages_to_rotate = list(range(1, len(reader.pages) + 1))
-                
-                total_pages = len(reader.pages)
-                rotated_count = 0
-                
-                for i in range(total_pages):
-                    page = reader.pages[i]
-                    
-                    if (i + 1) in pages_to_rotate:
-                        page.rotate(angle)
-                        rotated_count += 1
-                    
-                    writer.add_page(page)
-                    
-                    progress = (i + 1) / total_pages * 100
-                    self.update_progress(progress, f"Processed page {i + 1}/{total_pages}")
-                
-                with open(output_file, 'wb') as output_pdf:
-                    writer.write(output_pdf)
-            
-            self.update_progress(100, f"✅ Rotated {rotated_count} pages!")
-            messagebox.showinfo("Success", f"Rotated PDF saved: {output_file}")
+            result = engine.rotate_pdf(pdf_path, output_file, angle, pages_input, in_place,
+                                       progress=self.update_progress)
+            self.update_progress(100, f"✅ Rotated {result['rotated']} pages!")
+            messagebox.showinfo("Success", f"Rotated PDF saved: {result['output']}")
         except Exception as e:
             self.update_progress(0, f"❌ Error: {str(e)}")
             messagebox.showerror("Error", f"Rotation failed: {str(e)}")
 
+    def ocr_pdf_gui(self):
+        if not self.validate_pdf_file():
+            return
+
+        dpi = simpledialog.askinteger("OCR Scans", "OCR resolution in DPI (150-600):", minvalue=150, maxvalue=600,
+                                      initialvalue=300)
+        if not dpi:
+            return
+        language = simpledialog.askstring("OCR Scans", "Tesseract language(s), e.g. eng or eng+deu:",
+                                          initialvalue="eng")
+        if not language:
+            return
+
+        output_file = self.ask_output_file(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        )
+        if not output_file:
+            return
+
+        options = {'dpi': dpi, 'language': language, 'cache': default_cache()}
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'ocr', output_file, options)
+        else:
+            self.run_in_thread(self.ocr_pdf_thread, self.selected_files[0], output_file, options)
+
+    def ocr_pdf_thread(self, pdf_path, output_file, options):
+        try:
+            result = engine.ocr_pdf(pdf_path, output_file, progress=self.update_progress, **options)
+            pages = len(result['ocr_pages'])
+            self.update_progress(100, f"✅ OCR added a text layer to {pages} pages")
+            messagebox.showinfo("Success", f"Searchable PDF saved: {output_file}\n"
+                                           f"{pages} scanned pages recognised, pages with text were left as they were")
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"OCR failed: {str(e)}")
+
+    def build_recipe(self):
+        # One dialog per step; an empty answer (or 0 for the angle) leaves the step out.
+        steps = []
+        pages = simpledialog.askstring("Recipe", "1/4 Extract pages (e.g. 1-10,15, leave empty to keep all):")
+        if pages:
+            steps.append({'op': 'extract', 'pages': pages})
+        angle = simpledialog.askinteger("Recipe", "2/4 Rotate by degrees (0 = no rotation):",
+                                        minvalue=-270, maxvalue=270, initialvalue=0)
+        if angle:
+            rotate = {'op': 'rotate', 'angle': angle}
+            rotate_pages = simpledialog.askstring("Recipe", "Pages to rotate (leave empty for all pages):")
+            if rotate_pages:
+                rotate['pages'] = rotate_pages
+            steps.append(rotate)
+        quality = simpledialog.askinteger("Recipe", "3/4 Compress at quality 1-100 (0 = no compression):",
+                                          minvalue=0, maxvalue=100, initialvalue=0)
+        if quality:
+            steps.append({'op': 'compress', 'quality': quality})
+        if messagebox.askyesno("Recipe", "4/4 Protect the result with a password?"):
+            steps.append({'op': 'protect'})
+        return steps
+
+    def recipe_gui(self):
+        if not self.validate_pdf_file():
+            return
+
+        try:
+            if messagebox.askyesno("Run Recipe", "Load a saved recipe?\n(No builds a new one)"):
+                path = filedialog.askopenfilename(title="Select recipe",
+                                                  filetypes=[("Recipe files", "*.json"), ("All files", "*.*")])
+                if not path:
+                    return
+                steps = pipeline.load_recipe(path)
+            else:
+                steps = self.build_recipe()
+                if not steps:
+                    return
+                if messagebox.askyesno("Run Recipe", f"{pipeline.describe(steps)}\n\nSave this recipe for reuse?"):
+                    path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                        filetypes=[("Recipe files", "*.json")])
+                    if path:
+                        pipeline.save_recipe(steps, path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Invalid recipe: {str(e)}")
+            return
+
+        password = None
+        if pipeline.needs_password(steps):
+            password = simpledialog.askstring("Run Recipe", "Password for the protected PDF:", show='*')
+            if not password:
+                return
+
+        output_file = self.ask_output_file(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
+        )
+        if not output_file:
+            return
+
+        if self.is_batch():
+            self.run_in_thread(self.batch_thread, 'pipeline', output_file, {'recipe': steps, 'password': password})
+        else:
+            self.run_in_thread(self.recipe_thread, self.selected_files[0], output_file, steps, password)
+
+    def recipe_thread(self, pdf_path, output_file, steps, password=None):
+        try:
+            result = engine.run_pipeline(pdf_path, output_file, steps, password, progress=self.update_progress)
+            self.update_progress(100, f"✅ Recipe finished ({len(result['steps'])} steps, one save)")
+            messagebox.showinfo(
+                "Success",
+                f"Processed PDF saved: {output_file}\n"
+                f"{pipeline.describe(steps)}\n"
+                f"{result['original_size']:.1f} KB → {result['new_size']:.1f} KB"
+            )
+        except Exception as e:
+            self.update_progress(0, f"❌ Error: {str(e)}")
+            messagebox.showerror("Error", f"Recipe failed: {str(e)}")
+
 def main():
     root = tk.Tk()
     app = PDFToolkitGUI(root)
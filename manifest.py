@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+
+import tracing
+from cache import DEFAULT_CACHE_DIR, hash_file, open_database
+from engine import _noop_progress, resolve_workers
+from progress import Meter
+
+DEFAULT_MANIFEST_PATH = os.environ.get('PDF_TOOLKIT_MANIFEST', os.path.join(DEFAULT_CACHE_DIR, 'manifest.sqlite'))
+# Listing and stat calls wait on the disk or the network, not the CPU.
+SCAN_THREADS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    pages INTEGER,
+    encrypted INTEGER,
+    digest TEXT,
+    error TEXT,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+"""
+
+FIELDS = ('path', 'size', 'mtime_ns', 'pages', 'encrypted', 'digest', 'error')
+
+
+def _under(folder):
+    # SQL condition for "folder or anything below it", with LIKE wildcards escaped
+    root = os.path.abspath(folder)
+    prefix = os.path.join(root, '').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return root, prefix + '%'
+
+
+def _list_dir(path):
+    # DirEntry.stat() is answered from the directory listing on Windows and SMB
+    # shares, so this is one round trip per directory rather than per file.
+    files, dirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                continue
+    return files, dirs
+
+
+def file_details(path):
+    import pymupdf
+
+    details = {'pages': None, 'encrypted': None, 'digest': None, 'error': None}
+    try:
+        with tracing.span("manifest.details", file=os.path.basename(path)):
+            with pymupdf.open(path) as doc:
+                details['encrypted'] = bool(doc.needs_pass)
+                details['pages'] = len(doc)
+            details['digest'] = hash_file(path)
+    except Exception as e:
+        details['error'] = str(e)
+    return details
+
+
+class Manifest:
+    # A cached listing of every PDF below the scanned folders with its size,
+    # mtime, page count, encryption flag and content hash. Rescans only open
+    # and hash files whose size or mtime changed.
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = open_database(self.path, _SCHEMA)
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def _walk(self, root):
+        # Breadth-first over a thread pool, so the latency of each listing
+        # overlaps with the others.
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        files, dirs = [], 0
+        with ThreadPoolExecutor(max_workers=SCAN_THREADS) as pool:
+            pending = {pool.submit(_list_dir, root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        child_files, child_dirs = future.result()
+                    except OSError:
+                        continue
+                    dirs += 1
+                    files.extend(child_files)
+                    pending.update(pool.submit(_list_dir, path) for path in child_dirs)
+        return files, dirs
+
+    def scan(self, folder, details=True, workers=0, progress=None):
+        progress = progress or _noop_progress
+        progress(0, "Scanning folder...")
+        root, pattern = _under(folder)
+
+        known = {row[0]: row for row in self._query(
+            "SELECT path, size, mtime_ns, digest, error FROM files WHERE folder = ? OR folder LIKE ? ESCAPE '\\'",
+            (root, pattern))}
+
+        with tracing.span("manifest.walk"):
+            found, dirs = self._walk(root)
+
+        seen = {path for path, _, _ in found}
+        changed = [(path, size, mtime_ns) for path, size, mtime_ns in found
+                   if path not in known or known[path][1] != size or known[path][2] != mtime_ns]
+        removed = [path for path in known if path not in seen]
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            # Changed entries lose their details until fill_details() reads them again.
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, folder, size, mtime_ns, scanned_at) VALUES (?, ?, ?, ?, ?)",
+                [(path, os.path.dirname(path), size, mtime_ns, now) for path, size, mtime_ns in changed],
+            )
+            conn.execute("COMMIT")
+
+        summary = {
+            'folder': root,
+            'files': sorted(seen),
+            'added': sum(1 for path, _, _ in changed if path not in known),
+            'changed': sum(1 for path, _, _ in changed if path in known),
+            'removed': len(removed),
+            'unchanged': len(seen) - len(changed),
+            'dirs': dirs,
+        }
+        if details:
+            summary['details'] = self.fill_details(root, workers, progress)
+        return summary
+
+    def fill_details(self, folder, workers=0, progress=None):
+        # Opens and hashes only the entries under folder that have no details yet:
+        # new or changed files, or ones listed by a scan with details=False.
+        progress = progress or _noop_progress
+        rows = self._query("SELECT path FROM files WHERE (folder = ? OR folder LIKE ? ESCAPE '\\') "
+                           "AND digest IS NULL AND error IS NULL", _under(folder))
+        paths = [path for (path,) in rows]
+        total = len(paths)
+        meter = Meter(progress, total, 'file')
+        if not paths:
+            return {'read': 0, **meter.stats()}
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = resolve_workers(workers or SCAN_THREADS, total)
+        batch = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for done, (path, info) in enumerate(zip(paths, pool.map(file_details, paths)), start=1):
+                batch.append((info['pages'], info['encrypted'], info['digest'], info['error'], path))
+                if len(batch) >= 200 or done == total:
+                    with self._lock:
+                        self._connect().executemany(
+                            "UPDATE files SET pages = ?, encrypted = ?, digest = ?, error = ? WHERE path = ?", batch)
+                    batch = []
+                meter.update(done, f"Read {done}/{total} new or changed files")
+        return {'read': total, **meter.stats()}
+
+    def entries(self, folder):
+        rows = self._query(f"SELECT {', '.join(FIELDS)} FROM files WHERE folder = ? OR folder LIKE ? ESCAPE '\\' "
+                           "ORDER BY path", _under(folder))
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_manifest = None
+
+
+def default_manifest():
+    global _default_manifest
+    if _default_manifest is None:
+        _default_manifest = Manifest()
+    return _default_manifest
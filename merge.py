@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+import tracing
+from engine import PDFToolkitError, _noop_progress
+from progress import Meter
+
+CHECKPOINT_EVERY = 200
+
+
+def _shifted_toc(src, offset, level_shift):
+    entries = []
+    for level, title, page in src.get_toc(simple=True):
+        page = page + offset if page >= 1 else offset + 1
+        entries.append([level + level_shift, title, page])
+    return entries
+
+
+def checkpoint(out, folder, count):
+    # Writing the partial result out and reopening it lets MuPDF drop the copied
+    # objects from memory; they are read back lazily from disk when needed.
+    import pymupdf
+
+    # out is closed here whatever happens, so the caller must drop its reference
+    # before calling.
+    previous = out.name
+    path = os.path.join(folder, f"checkpoint_{count:06d}.pdf")
+    with tracing.span("merge.checkpoint", count=count):
+        try:
+            out.save(path, garbage=1)
+        finally:
+            out.close()
+    if previous and previous.startswith(folder):
+        os.remove(previous)
+    return pymupdf.open(path)
+
+
+def merge_files(pdf_files, output_file, file_bookmarks=False, checkpoint_every=CHECKPOINT_EVERY, dedupe_streams=True,
+                progress=None):
+    import pymupdf
+
+    progress = progress or _noop_progress
+    progress(0, "Merging PDFs...")
+
+    total_files = len(pdf_files)
+    meter = Meter(progress, total_files, 'file')
+    toc = []
+
+    with tempfile.TemporaryDirectory(prefix="pdf_merge_", dir=os.path.dirname(os.path.abspath(output_file))) as tmp:
+        out = pymupdf.open()
+        try:
+            for i, pdf_file in enumerate(pdf_files):
+                with tracing.span("merge.open", file=os.path.basename(pdf_file)):
+                    src = pymupdf.open(pdf_file)
+                with src:
+                    if src.needs_pass:
+                        raise PDFToolkitError(f"{os.path.basename(pdf_file)} is password protected")
+                    offset = len(out)
+                    with tracing.span("merge.insert", file=os.path.basename(pdf_file), pages=len(src)):
+                        out.insert_pdf(src)
+                    if file_bookmarks:
+                        toc.append([1, os.path.splitext(os.path.basename(pdf_file))[0], offset + 1])
+                        toc.extend(_shifted_toc(src, offset, 1))
+                    else:
+                        toc.extend(_shifted_toc(src, offset, 0))
+
+                if checkpoint_every and (i + 1) % checkpoint_every == 0 and i + 1 < total_files:
+                    partial, out = out, None
+                    out = checkpoint(partial, tmp, i + 1)
+                meter.update(i + 1, f"Merged {i + 1}/{total_files} files")
+
+            if toc:
+                out.set_toc(toc)
+            progress(100, "Writing merged PDF...")
+            # garbage=4 also compares stream contents, so fonts and logos repeated
+            # across the inputs are stored once. That comparison covers every
+            # object in the merged file; garbage=3 only merges identical
+            # dictionaries and is much cheaper for thousands of inputs.
+            with tracing.span("merge.save", dedupe_streams=dedupe_streams):
+                out.save(output_file, garbage=4 if dedupe_streams else 3, deflate=True)
+            pages = len(out)
+        finally:
+            if out is not None:
+                out.close()
+
+    return {
+        'output': output_file,
+        'files': total_files,
+        'pages': pages,
+        'bookmarks': len(toc),
+        'size': os.path.getsize(output_file),
+        **meter.stats(),
+    }
@@ -0,0 +1,218 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import tracing
+from engine import PDFToolkitError, _noop_progress, chunked, resolve_workers
+from progress import Meter
+
+DEFAULT_DPI = 300
+DEFAULT_LANGUAGE = os.environ.get('PDF_TOOLKIT_OCR_LANG', 'eng')
+# The invisible layer only has to be found by search and copy; Helvetica keeps
+# the file small (characters outside Latin-1 become '?').
+LAYER_FONT = 'helv'
+# Baseline of a word box, as a share of its height from the top
+BASELINE = 0.8
+
+
+def check_tesseract():
+    import pymupdf
+
+    try:
+        tessdata = pymupdf.get_tessdata()
+    except Exception:
+        tessdata = None
+    if not tessdata:
+        raise PDFToolkitError("OCR needs Tesseract: install it and set TESSDATA_PREFIX to its tessdata folder")
+    return tessdata
+
+
+def needs_ocr(page):
+    # Cheapest checks first: a page without images has nothing to recognise, and
+    # one without fonts cannot have a text layer. get_images() only lists image
+    # XObjects, so a page without any is parsed once more for inline (BI...EI)
+    # images, which some scanners draw pages with.
+    if not page.get_images() and not page.get_image_info():
+        return False
+    if not page.get_fonts():
+        return True
+    return not page.get_text("text").strip()
+
+
+def find_textless_pages(doc, page_numbers=None):
+    if page_numbers is None:
+        page_numbers = range(len(doc))
+    with tracing.span("ocr.detect"):
+        return [page_num for page_num in page_numbers if needs_ocr(doc[page_num])]
+
+
+def recognize_page(doc, page_num, dpi=DEFAULT_DPI, language=DEFAULT_LANGUAGE):
+    with tracing.span("ocr.page", page=page_num, dpi=dpi):
+        page = doc[page_num]
+        textpage = page.get_textpage_ocr(dpi=dpi, language=language, full=True)
+        text = page.get_text("text", textpage=textpage, sort=True)
+        words = [list(word[:5]) for word in page.get_text("words", textpage=textpage)]
+    return {'text': text, 'words': words}
+
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    global _worker_doc
+    import pymupdf
+
+    _worker_doc = pymupdf.open(pdf_path)
+
+
+def _recognize_chunk(page_numbers, dpi, language):
+    return [(page_num, recognize_page(_worker_doc, page_num, dpi, language)) for page_num in page_numbers]
+
+
+def recognize(pdf_path, page_numbers=None, dpi=DEFAULT_DPI, language=DEFAULT_LANGUAGE, workers=0, cache=None,
+              progress=None):
+    # page index -> {'text', 'words'} for the pages among page_numbers that have
+    # no text layer. Pages with text are never rendered or recognised.
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    progress(0, "Looking for pages without text...")
+
+    with default_registry().document(pdf_path, 'pymupdf') as doc:
+        textless = find_textless_pages(doc, page_numbers)
+    if not textless:
+        return {}
+
+    params = {'dpi': dpi, 'language': language}
+    results = {}
+    if cache is not None:
+        digest = cache.file_digest(pdf_path)
+        for page_num in cache.cached_pages(digest, 'ocr', params) & set(textless):
+            results[page_num] = cache.get_json(digest, page_num, 'ocr', params)
+    missing = [page_num for page_num in textless if page_num not in results]
+
+    meter = Meter(progress, len(textless))
+    meter.update(len(results), f"OCR: {len(results)} pages from cache")
+    if not missing:
+        return results
+
+    check_tesseract()
+    # OCR costs seconds per page, so even two pages are worth a second process.
+    workers = resolve_workers(workers, len(missing))
+    if workers == 1:
+        import pymupdf
+
+        doc = pymupdf.open(pdf_path)
+        fresh = ((page_num, recognize_page(doc, page_num, dpi, language)) for page_num in missing)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        doc = None
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,))
+        fresh = (item for chunk in pool.map(_recognize_chunk, chunked(missing, 1), [dpi] * len(missing),
+                                            [language] * len(missing))
+                 for item in chunk)
+
+    try:
+        for page_num, result in fresh:
+            results[page_num] = result
+            if cache is not None:
+                cache.put_json(digest, page_num, 'ocr', result, params)
+            meter.update(len(results), f"OCR: recognised page {page_num + 1} ({len(results)}/{len(textless)})")
+    finally:
+        if doc is not None:
+            doc.close()
+        if workers > 1:
+            pool.shutdown()
+    return results
+
+
+def add_text_layer(page, words):
+    # Each word is drawn invisibly (render mode 3) over its box, stretched to the
+    # box width, so selection and search line up with the scan.
+    import pymupdf
+
+    shape = page.new_shape()
+    derotate = page.derotation_matrix
+    for x0, y0, x1, y1, word in words:
+        rect = pymupdf.Rect(x0, y0, x1, y1) * derotate
+        if not word.strip() or rect.is_empty:
+            continue
+        fontsize = rect.height
+        length = pymupdf.get_text_length(word, fontname=LAYER_FONT, fontsize=fontsize)
+        if not length:
+            continue
+        point = pymupdf.Point(rect.x0, rect.y0 + rect.height * BASELINE)
+        shape.insert_text(point, word, fontsize=fontsize, fontname=LAYER_FONT, render_mode=3,
+                          morph=(point, pymupdf.Matrix(rect.width / length, 1)))
+    shape.commit()
+
+
+def write_text_layers(pdf_path, output_file, results):
+    # Like rotate, the new text is appended as an incremental update, on a copy
+    # unless output_file is pdf_path.
+    import pymupdf
+
+    if os.path.abspath(output_file) != os.path.abspath(pdf_path):
+        with tracing.span("ocr.copy"):
+            shutil.copyfile(pdf_path, output_file)
+    with tracing.span("ocr.text_layer", pages=len(results)):
+        doc = pymupdf.open(output_file)
+        try:
+            for page_num, result in sorted(results.items()):
+                add_text_layer(doc[page_num], result['words'])
+            incremental = doc.can_save_incrementally()
+            if incremental:
+                doc.saveIncr()
+            else:
+                data = doc.tobytes(garbage=1, deflate=True)
+        finally:
+            doc.close()
+    if not incremental:
+        with open(output_file, 'wb') as output_pdf:
+            output_pdf.write(data)
+
+
+def make_searchable(pdf_path, output_file, dpi=DEFAULT_DPI, language=DEFAULT_LANGUAGE, workers=0, cache=None,
+                    progress=None):
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    results = recognize(pdf_path, None, dpi, language, workers, cache,
+                        progress=lambda value, text="": progress(value * 0.95, text))
+    progress(95, "Adding text layer...")
+    if os.path.abspath(output_file) == os.path.abspath(pdf_path):
+        default_registry().invalidate(pdf_path)
+    if results:
+        write_text_layers(pdf_path, output_file, results)
+    elif os.path.abspath(output_file) != os.path.abspath(pdf_path):
+        shutil.copyfile(pdf_path, output_file)
+
+    return {
+        'output': output_file,
+        'ocr_pages': sorted(page_num + 1 for page_num in results),
+        'words': sum(len(result['words']) for result in results.values()),
+        'dpi': dpi,
+        'language': language,
+    }
+
+
+@contextmanager
+def searchable_copy(pdf_path, dpi=DEFAULT_DPI, language=DEFAULT_LANGUAGE, workers=0, cache=None, progress=None):
+    # Yields a path to read text from: pdf_path itself when every page already
+    # has text, otherwise a temporary copy with the OCR text layer added. Word
+    # and table export then see recognised pages like any other.
+    from docregistry import default_registry
+
+    results = recognize(pdf_path, None, dpi, language, workers, cache, progress)
+    if not results:
+        yield pdf_path
+        return
+    with tempfile.TemporaryDirectory(prefix='pdf-toolkit-ocr-') as folder:
+        copy_path = os.path.join(folder, os.path.basename(pdf_path))
+        write_text_layers(pdf_path, copy_path, results)
+        try:
+            yield copy_path
+        finally:
+            default_registry().invalidate(copy_path)
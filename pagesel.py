@@ -0,0 +1,110 @@
+import bisect
+import re
+
+_TOKEN = re.compile(r'^(-?\d+)?(?:(-)(-?\d+)?)?$')
+
+
+class PageSet:
+    # A set of 1-based page numbers held as sorted, merged (first, last) ranges.
+    # Membership is a bisect over the range starts, so it costs the same for a
+    # 3-page and a 300,000-page selection, and nothing is ever expanded.
+
+    __slots__ = ('_starts', '_ends', 'total')
+
+    def __init__(self, ranges=(), total=None):
+        merged = []
+        for first, last in sorted(ranges):
+            if first > last:
+                continue
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        self._starts = [first for first, _ in merged]
+        self._ends = [last for _, last in merged]
+        self.total = total
+
+    @classmethod
+    def all(cls, total):
+        return cls([(1, total)], total)
+
+    def __contains__(self, page):
+        index = bisect.bisect_right(self._starts, page) - 1
+        return index >= 0 and page <= self._ends[index]
+
+    def __iter__(self):
+        for first, last in zip(self._starts, self._ends):
+            yield from range(first, last + 1)
+
+    def __len__(self):
+        return sum(last - first + 1 for first, last in zip(self._starts, self._ends))
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    def __eq__(self, other):
+        return isinstance(other, PageSet) and self.ranges() == other.ranges()
+
+    def __repr__(self):
+        return f"PageSet({format_pages(self)!r})"
+
+    def ranges(self):
+        return list(zip(self._starts, self._ends))
+
+    def indexes(self):
+        # 0-based page indexes, for the PDF libraries
+        for page in self:
+            yield page - 1
+
+
+def _resolve(number, total):
+    # 1-based; -1 is the last page, -2 the one before it
+    value = int(number)
+    if value < 0:
+        return total + 1 + value
+    if value == 0:
+        raise ValueError("Page numbers start at 1")
+    return value
+
+
+def parse_pages(spec, total):
+    # "1-3,7", "odd", "even", "all", "5-" (5 to the end), "-1" (last page),
+    # "-3--1" (last three). Empty or None selects every page. Pages past the end
+    # are dropped.
+    if spec is None or not str(spec).strip():
+        return PageSet.all(total)
+
+    ranges = []
+    for part in str(spec).replace(' ', '').lower().split(','):
+        if not part:
+            continue
+        if part in ('all', '*'):
+            ranges.append((1, total))
+            continue
+        if part in ('odd', 'even'):
+            ranges.extend((page, page) for page in range(1 if part == 'odd' else 2, total + 1, 2))
+            continue
+
+        match = _TOKEN.match(part)
+        if not match or (match.group(1) is None and match.group(3) is None):
+            raise ValueError(f"Invalid page selection: {part!r}")
+        start, dash, end = match.groups()
+        if start is None:
+            # "-3" is a negative index, never "up to 3"
+            first = last = _resolve('-' + end, total)
+        elif dash is None:
+            first = last = _resolve(start, total)
+        else:
+            first = _resolve(start, total)
+            last = _resolve(end, total) if end is not None else total
+        first, last = max(first, 1), min(last, total)
+        if first <= last:
+            ranges.append((first, last))
+    return PageSet(ranges, total)
+
+
+def format_pages(pages):
+    parts = []
+    for first, last in pages.ranges():
+        parts.append(str(first) if first == last else f"{first}-{last}")
+    return ','.join(parts)
@@ -0,0 +1,178 @@
+import inspect
+import json
+import os
+
+import tracing
+from engine import PDFToolkitError, _noop_progress
+
+RECIPE_VERSION = 1
+# Share of the progress bar left for the final save
+SAVE_SHARE = 10
+
+
+class _Run:
+    # The document being worked on plus what the final save needs to know.
+
+    def __init__(self, doc, source, workers):
+        self.doc = doc
+        # Path of a file identical to doc, for worker processes; None once a step
+        # has changed the document in memory.
+        self.source = source
+        self.workers = workers
+        self.compressed = False
+        self.encryption = None
+
+
+def _extract(run, progress, pages):
+    import pagesel
+
+    selection = pagesel.parse_pages(pages, len(run.doc))
+    if not selection:
+        raise PDFToolkitError(f"Page selection {pages!r} matches no pages")
+    run.doc.select(list(selection.indexes()))
+    run.source = None
+    return {'pages': len(selection)}
+
+
+def _rotate(run, progress, angle=90, pages=None):
+    import pagesel
+
+    if angle % 90:
+        raise ValueError(f"Rotation must be a multiple of 90 degrees, got {angle}")
+    rotated = 0
+    for page_index in pagesel.parse_pages(pages, len(run.doc)).indexes():
+        page = run.doc[page_index]
+        page.set_rotation((page.rotation + angle) % 360)
+        rotated += 1
+    run.source = None
+    return {'rotated': rotated}
+
+
+def _compress(run, progress, quality=75, target_dpi=150, image_format='jpeg'):
+    import compress
+
+    report = compress.compress_document(run.doc, quality, target_dpi, image_format, run.workers,
+                                        source=run.source, progress=progress)
+    run.compressed = True
+    run.source = None
+    return {'images_recompressed': sum(1 for entry in report if entry['action'] == 'recompressed'),
+            'duplicates_removed': sum(len(entry['duplicates']) for entry in report
+                                      if entry['action'] == 'recompressed')}
+
+
+def _protect(run, progress, password=None, owner_password=None):
+    # Encryption is applied by the single save at the end, so this must be the
+    # last step.
+    import pymupdf
+
+    if not password:
+        raise PDFToolkitError("The protect step needs a password")
+    run.encryption = {'encryption': pymupdf.PDF_ENCRYPT_AES_256, 'user_pw': password,
+                      'owner_pw': owner_password or password}
+    return {'encryption': 'AES-256'}
+
+
+STEPS = {
+    'extract': _extract,
+    'rotate': _rotate,
+    'compress': _compress,
+    'protect': _protect,
+}
+
+
+def validate_recipe(steps):
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("A recipe needs at least one step")
+    checked = []
+    for index, step in enumerate(steps, start=1):
+        op = step.get('op') if isinstance(step, dict) else step
+        if not isinstance(step, dict) or op not in STEPS:
+            raise ValueError(f"Step {index}: unknown operation {op!r} (choose from {', '.join(STEPS)})")
+        params = {key: value for key, value in step.items() if key != 'op'}
+        if step['op'] == 'protect' and index != len(steps):
+            raise ValueError("protect must be the last step of a recipe")
+        try:
+            inspect.signature(STEPS[step['op']]).bind(None, None, **params)
+        except TypeError as e:
+            raise ValueError(f"Step {index} ({step['op']}): {e}") from None
+        checked.append({'op': step['op'], **params})
+    return checked
+
+
+def needs_password(steps):
+    return any(step.get('op') == 'protect' and not step.get('password') for step in steps)
+
+
+def load_recipe(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    steps = data.get('steps') if isinstance(data, dict) else data
+    return validate_recipe(steps)
+
+
+def save_recipe(steps, path):
+    # Passwords are never written out; they are asked for when the recipe runs.
+    steps = [{key: value for key, value in step.items() if key not in ('password', 'owner_password')}
+             for step in steps]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': RECIPE_VERSION, 'steps': steps}, f, indent=2)
+    return path
+
+
+def describe(steps):
+    parts = []
+    for step in steps:
+        params = ', '.join(f"{key}={value}" for key, value in step.items()
+                           if key != 'op' and key not in ('password', 'owner_password'))
+        parts.append(f"{step['op']}({params})" if params else step['op'])
+    return ' → '.join(parts)
+
+
+def run_pipeline(pdf_path, output_file, recipe, password=None, workers=0, progress=None):
+    # Runs every step on one open document and writes the result once, instead
+    # of a full read and write per operation.
+    import pymupdf
+
+    progress = progress or _noop_progress
+    steps = load_recipe(recipe) if isinstance(recipe, str) else validate_recipe(recipe)
+    if password and needs_password(steps):
+        # A recipe file never holds the password; it is supplied for each run.
+        steps[-1]['password'] = password
+    progress(0, f"Running {describe(steps)}...")
+
+    original_size = os.path.getsize(pdf_path) / 1024
+    with tracing.span("pipeline.open"):
+        doc = pymupdf.open(pdf_path)
+    try:
+        if doc.needs_pass:
+            raise PDFToolkitError("PDF is password protected, unlock it before running a recipe")
+        run = _Run(doc, pdf_path, workers)
+        share = (100 - SAVE_SHARE) / len(steps)
+        results = []
+        for index, step in enumerate(steps):
+            base = index * share
+
+            def step_progress(value, text="", base=base):
+                progress(base + value * share / 100, text)
+
+            step_progress(0, f"Step {index + 1}/{len(steps)}: {step['op']}...")
+            params = {key: value for key, value in step.items() if key != 'op'}
+            with tracing.span(f"pipeline.{step['op']}", step=index):
+                result = STEPS[step['op']](run, step_progress, **params)
+            results.append({'op': step['op'], **result})
+
+        progress(100 - SAVE_SHARE, "Writing PDF...")
+        with tracing.span("pipeline.save", compressed=run.compressed, encrypted=run.encryption is not None):
+            doc.save(output_file, garbage=4 if run.compressed else 1, deflate=True, clean=run.compressed,
+                     **(run.encryption or {}))
+        pages = len(doc)
+    finally:
+        doc.close()
+
+    return {
+        'output': output_file,
+        'pages': pages,
+        'steps': results,
+        'original_size': original_size,
+        'new_size': os.path.getsize(output_file) / 1024,
+    }
@@ -0,0 +1,70 @@
+import queue
+import time
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class Meter:
+    # Turns "n of total done" into progress(value, text) calls that carry rate and ETA,
+    # and keeps the throughput figures an operation returns in its result.
+
+    def __init__(self, progress, total, unit='page'):
+        self.progress = progress
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, done, text=None):
+        self.done = done
+        rate = self.rate()
+        eta = (self.total - done) / rate if rate else None
+        value = done / self.total * 100 if self.total else 100
+        text = text or f"Processed {self.unit} {done}/{self.total}"
+        self.progress(value, f"{text} | {rate:.1f} {self.unit}s/s | ETA {format_eta(eta)}")
+
+    def stats(self):
+        return {
+            'elapsed': round(time.perf_counter() - self.started, 3),
+            f'{self.unit}s_per_sec': round(self.rate(), 2),
+        }
+
+
+class ProgressChannel:
+    # Worker threads call the channel like any progress callback; the UI thread
+    # drains it on a timer and only ever sees the most recent event.
+
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+        self.dropped = 0
+
+    def __call__(self, value, text=""):
+        self._events.put((value, text))
+
+    def drain(self):
+        value = text = None
+        count = 0
+        while True:
+            try:
+                event_value, event_text = self._events.get_nowait()
+            except queue.Empty:
+                break
+            count += 1
+            value = event_value
+            if event_text:
+                text = event_text
+        if not count:
+            return None
+        self.dropped += count - 1
+        return value, text
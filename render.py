@@ -0,0 +1,202 @@
+import math
+import os
+import struct
+import zlib
+
+import tracing
+from engine import PDFToolkitError
+
+FORMATS = ('png', 'jpg', 'jpeg', 'webp')
+DEFAULT_QUALITY = 85
+DEFAULT_MEMORY_MB = int(os.environ.get('PDF_TOOLKIT_RENDER_MB', '512'))
+# Raw RGB samples plus the encoder's working copy of them
+BYTES_PER_PIXEL = 6
+TILE_SIZE = 256
+WEBP_MAX_SIDE = 16383
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def render_size(page, zoom):
+    import pymupdf
+
+    irect = (page.rect * pymupdf.Matrix(zoom, zoom)).irect
+    return irect.width, irect.height
+
+
+def encode(pix, path, fmt, quality=DEFAULT_QUALITY):
+    with tracing.span("images.write", format=fmt):
+        if fmt == 'webp':
+            from PIL import Image
+
+            Image.frombytes('RGB', (pix.width, pix.height), pix.samples).save(path, 'WEBP', quality=quality)
+        elif fmt in ('jpg', 'jpeg'):
+            pix.save(path, jpg_quality=quality)
+        else:
+            pix.save(path)
+
+
+def _png_chunk(f, kind, data):
+    f.write(struct.pack('>I', len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+
+class PNGStream:
+    # An 8-bit RGB PNG written band by band: only the current band and zlib's
+    # window are in memory, however tall the image is. Rows use filter type 0,
+    # which is cheap to produce from Python and compresses well enough for
+    # rendered pages.
+
+    def __init__(self, path, width, height, level=6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        _png_chunk(self._file, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        self._zlib = zlib.compressobj(level)
+
+    def write(self, pix, rows):
+        # Writes exactly `rows` rows of the image from pix. Clip rounding can make
+        # a rendered band a pixel narrower, wider or shorter than planned, so rows
+        # are trimmed or padded with white to the planned size.
+        line = self.width * 3
+        samples = pix.samples_mv
+        stride = pix.stride
+        available = min(pix.width * 3, line)
+        data = bytearray()
+        for row in range(rows):
+            data += b'\x00'
+            if row < pix.height:
+                start = row * stride
+                data += samples[start:start + available]
+                if available < line:
+                    data += b'\xff' * (line - available)
+            else:
+                data += b'\xff' * line
+        compressed = self._zlib.compress(data)
+        if compressed:
+            _png_chunk(self._file, b'IDAT', compressed)
+        self.rows += rows
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            _png_chunk(self._file, b'IDAT', self._zlib.flush())
+            _png_chunk(self._file, b'IEND', b'')
+        finally:
+            self._file.close()
+            self._file = None
+        if self.rows != self.height:
+            raise ValueError(f"PNG stream got {self.rows} of {self.height} rows")
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def render_banded(page, zoom, path, budget_bytes):
+    # Renders the page as horizontal bands clipped from one display list and
+    # streams them into a PNG, so peak memory is one band, not one page.
+    import pymupdf
+
+    width, height = render_size(page, zoom)
+    band_rows = max(1, min(height, budget_bytes // max(1, width * BYTES_PER_PIXEL)))
+    matrix = pymupdf.Matrix(zoom, zoom)
+    with tracing.span("images.display_list", page=page.number):
+        display_list = page.get_displaylist()
+
+    stream = PNGStream(path, width, height)
+    try:
+        for top in range(0, height, band_rows):
+            rows = min(band_rows, height - top)
+            clip = pymupdf.Rect(page.rect.x0, page.rect.y0 + top / zoom,
+                                page.rect.x1, page.rect.y0 + (top + rows) / zoom)
+            with tracing.span("images.render_band", page=page.number, top=top, rows=rows):
+                pix = display_list.get_pixmap(matrix=matrix, clip=clip)
+            stream.write(pix, rows)
+            del pix
+        stream.close()
+    except BaseException:
+        stream.abort()
+        raise
+    return {'path': path, 'width': width, 'height': height, 'bands': math.ceil(height / band_rows)}
+
+
+def write_pyramid(page, zoom, folder, name, fmt, quality=DEFAULT_QUALITY, tile_size=TILE_SIZE):
+    # A Deep Zoom (DZI) pyramid: level L is the page at 1/2**(top - L) of full
+    # size cut into tile_size squares, stored as {name}_files/L/col_row.fmt.
+    # Every tile is rendered from the vector display list at its own level, so
+    # no level is downsampled from a full-size bitmap and memory stays at one tile.
+    import pymupdf
+
+    width, height = render_size(page, zoom)
+    top_level = math.ceil(math.log2(max(width, height, 1)))
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    tiles_folder = os.path.join(folder, f"{name}_files")
+    with tracing.span("images.display_list", page=page.number):
+        display_list = page.get_displaylist()
+
+    tiles = 0
+    for level in range(top_level + 1):
+        scale = 2 ** (top_level - level)
+        level_width, level_height = math.ceil(width / scale), math.ceil(height / scale)
+        level_zoom = zoom / scale
+        matrix = pymupdf.Matrix(level_zoom, level_zoom)
+        level_folder = os.path.join(tiles_folder, str(level))
+        os.makedirs(level_folder, exist_ok=True)
+        for row in range(math.ceil(level_height / tile_size)):
+            for col in range(math.ceil(level_width / tile_size)):
+                x0, y0 = col * tile_size, row * tile_size
+                x1, y1 = min(x0 + tile_size, level_width), min(y0 + tile_size, level_height)
+                clip = pymupdf.Rect(page.rect.x0 + x0 / level_zoom, page.rect.y0 + y0 / level_zoom,
+                                    page.rect.x0 + x1 / level_zoom, page.rect.y0 + y1 / level_zoom)
+                with tracing.span("images.render_tile", page=page.number, level=level):
+                    pix = display_list.get_pixmap(matrix=matrix, clip=clip)
+                encode(pix, os.path.join(level_folder, f"{col}_{row}.{ext}"), fmt, quality)
+                tiles += 1
+
+    path = os.path.join(folder, f"{name}.dzi")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" Overlap="0" '
+                f'Format="{ext}">\n  <Size Width="{width}" Height="{height}"/>\n</Image>\n')
+    return {'path': path, 'width': width, 'height': height, 'levels': top_level + 1, 'tiles': tiles}
+
+
+def render_page(doc, page_num, zoom, folder, fmt='png', quality=DEFAULT_QUALITY, budget_bytes=None,
+                pyramid=False):
+    # Pages that fit the budget are rendered whole; larger ones are banded into
+    # a streamed PNG. JPEG and WebP encoders need the whole bitmap, so an
+    # oversized page in those formats asks for more memory, PNG or a pyramid.
+    if budget_bytes is None:
+        budget_bytes = DEFAULT_MEMORY_MB * 1024 * 1024
+    page = doc[page_num]
+    name = f"page_{page_num + 1:03d}"
+    if pyramid:
+        return write_pyramid(page, zoom, folder, name, fmt, quality)
+
+    path = os.path.join(folder, f"{name}.{fmt}")
+    width, height = render_size(page, zoom)
+    if width * height * BYTES_PER_PIXEL > budget_bytes:
+        if fmt != 'png':
+            needed = width * height * BYTES_PER_PIXEL / (1024 * 1024)
+            raise PDFToolkitError(f"Page {page_num + 1} needs about {needed:.0f} MB as {fmt.upper()}; "
+                                  "raise the memory budget, use PNG or render tiles")
+        return render_banded(page, zoom, path, budget_bytes)
+    if fmt == 'webp' and max(width, height) > WEBP_MAX_SIDE:
+        raise PDFToolkitError(f"Page {page_num + 1} is {width}x{height} px, larger than WebP allows; "
+                              "lower the DPI or render tiles")
+
+    import pymupdf
+
+    with tracing.span("images.render", page=page_num):
+        pix = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom))
+    encode(pix, path, fmt, quality)
+    return {'path': path, 'width': pix.width, 'height': pix.height}
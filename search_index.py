@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+
+import tracing
+from cache import DEFAULT_CACHE_DIR, hash_file, open_database
+from engine import _noop_progress, resolve_workers
+from progress import Meter
+
+DEFAULT_INDEX_PATH = os.environ.get('PDF_TOOLKIT_INDEX', os.path.join(DEFAULT_CACHE_DIR, 'search_index.sqlite'))
+COMMIT_EVERY = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+    text,
+    file_id UNINDEXED,
+    page UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def find_pdfs(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root_dir, _, files in os.walk(path):
+                found.extend(os.path.join(root_dir, name) for name in files if name.lower().endswith('.pdf'))
+        elif path.lower().endswith('.pdf') and os.path.isfile(path):
+            found.append(path)
+    return sorted({os.path.abspath(path) for path in found})
+
+
+def fts_query(text):
+    # Plain words must all appear; "a quoted phrase" must appear as written.
+    # Input is quoted token by token, so FTS5 operators in it are not special.
+    text = text.strip()
+    if len(text) > 1 and text.startswith('"') and text.endswith('"'):
+        return '"' + text[1:-1].replace('"', '""') + '"'
+    return ' '.join('"' + token.replace('"', '""') + '"' for token in text.split())
+
+
+def _read_file(path, known_digest=None):
+    # Runs in a worker. A file whose content hash is unchanged is not re-read.
+    import pymupdf
+    import textextract
+
+    stat = os.stat(path)
+    result = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': None,
+              'texts': None, 'error': None}
+    try:
+        with tracing.span("index.hash", file=os.path.basename(path)):
+            result['digest'] = hash_file(path)
+        if result['digest'] == known_digest:
+            return result
+        with tracing.span("index.extract", file=os.path.basename(path)), pymupdf.open(path) as doc:
+            if doc.needs_pass:
+                result['error'] = "password protected"
+                result['texts'] = []
+            else:
+                result['texts'] = [textextract.page_text(doc, 'pymupdf', page_num) for page_num in range(len(doc))]
+    except Exception as e:
+        result['error'] = str(e)
+        result['texts'] = []
+    return result
+
+
+class SearchIndex:
+    # A persistent SQLite FTS5 index with one row per PDF page. A file is
+    # re-read only when its size or mtime changed and its content hash differs.
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _new_connection(self):
+        return open_database(self.path, _SCHEMA)
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = self._new_connection()
+        return self._conn
+
+    def _known(self):
+        with self._lock:
+            rows = self._connect().execute("SELECT path, size, mtime_ns, digest FROM files").fetchall()
+        return {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in rows}
+
+    def _store(self, conn, result):
+        row = conn.execute("SELECT id FROM files WHERE path = ?", (result['path'],)).fetchone()
+        if result['texts'] is None:
+            # Touched but identical content: only the stat fields move.
+            conn.execute("UPDATE files SET size = ?, mtime_ns = ?, indexed_at = ? WHERE id = ?",
+                         (result['size'], result['mtime_ns'], time.time(), row[0]))
+            return
+        if row:
+            file_id = row[0]
+            conn.execute("DELETE FROM pages WHERE file_id = ?", (file_id,))
+            conn.execute("UPDATE files SET size = ?, mtime_ns = ?, digest = ?, page_count = ?, error = ?, "
+                         "indexed_at = ? WHERE id = ?",
+                         (result['size'], result['mtime_ns'], result['digest'], len(result['texts']),
+                          result['error'], time.time(), file_id))
+        else:
+            file_id = conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, digest, page_count, error, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (result['path'], result['size'], result['mtime_ns'], result['digest'], len(result['texts']),
+                 result['error'], time.time()),
+            ).lastrowid
+        conn.executemany("INSERT INTO pages (text, file_id, page) VALUES (?, ?, ?)",
+                         [(text or '', file_id, page_num) for page_num, text in enumerate(result['texts'])])
+
+    def update(self, paths, workers=0, prune=True, progress=None):
+        progress = progress or _noop_progress
+        progress(0, "Scanning for PDFs...")
+
+        files = find_pdfs(paths)
+        known = self._known()
+        changed = []
+        for path in files:
+            stat = os.stat(path)
+            entry = known.get(path)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                changed.append((path, entry[2] if entry else None))
+
+        removed = 0
+        if prune:
+            roots = [os.path.abspath(path) for path in paths if os.path.isdir(path)]
+            seen = set(files)
+            gone = [path for path in known
+                    if path not in seen and any(path.startswith(os.path.join(root, '')) for root in roots)]
+            removed = self.remove(gone)
+
+        total = len(changed)
+        meter = Meter(progress, total, 'file')
+        workers = resolve_workers(workers, total, min_jobs_per_worker=2)
+        counts = {'indexed': 0, 'unchanged': len(files) - total, 'failed': 0}
+
+        if workers == 1:
+            results = (_read_file(path, digest) for path, digest in changed)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_read_file, [c[0] for c in changed], [c[1] for c in changed],
+                               chunksize=max(1, min(16, total // (workers * 8))))
+
+        # The writer has its own connection; with WAL, searches on the shared one
+        # keep answering while a large re-index runs.
+        conn = self._new_connection()
+        try:
+            conn.execute("BEGIN")
+            try:
+                for done, result in enumerate(results, start=1):
+                    with tracing.span("index.store", file=os.path.basename(result['path'])):
+                        self._store(conn, result)
+                    if result['texts'] is None:
+                        counts['unchanged'] += 1
+                    elif result['error']:
+                        counts['failed'] += 1
+                    else:
+                        counts['indexed'] += 1
+                    if done % COMMIT_EVERY == 0:
+                        conn.execute("COMMIT")
+                        conn.execute("BEGIN")
+                    meter.update(done, f"Indexed {done}/{total} changed files")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+            if workers > 1:
+                pool.shutdown()
+
+        return {'files': len(files), 'removed': removed, 'workers': workers, **counts, **meter.stats()}
+
+    def remove(self, paths):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            removed = 0
+            for path in paths:
+                row = conn.execute("SELECT id FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM pages WHERE file_id = ?", (row[0],))
+                    conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+                    removed += 1
+            conn.execute("COMMIT")
+        return removed
+
+    def search(self, query, limit=50, raw=False, path_prefix=None):
+        # Hits are ranked by bm25; page numbers are 1-based.
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        sql = ("SELECT files.path, pages.page, snippet(pages, 0, '[', ']', '…', 12), pages.rank "
+               "FROM pages JOIN files ON files.id = pages.file_id WHERE pages MATCH ?")
+        params = [match]
+        if path_prefix:
+            # The path itself or anything below it; /a/b must not match /a/bc.
+            root = os.path.abspath(path_prefix)
+            sql += " AND (files.path = ? OR files.path LIKE ? ESCAPE '\\')"
+            prefix = os.path.join(root, '').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.extend([root, prefix + '%'])
+        sql += " ORDER BY pages.rank LIMIT ?"
+        params.append(limit)
+        with tracing.span("index.search"), self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [{'path': path, 'page': page + 1, 'snippet': snippet, 'rank': rank}
+                for path, page, snippet, rank in rows]
+
+    def stats(self):
+        with self._lock:
+            conn = self._connect()
+            files, pages, failed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(page_count), 0), COUNT(error) FROM files").fetchone()
+        return {'path': self.path, 'files': files, 'pages': pages, 'failed': failed,
+                'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_index = None
+
+
+def default_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = SearchIndex()
+    return _default_index
@@ -0,0 +1,172 @@
+import os
+import re
+
+import tracing
+from engine import PDFToolkitError, _noop_progress, chunked, resolve_workers
+from progress import Meter
+
+MODES = ('pages', 'bookmarks', 'size')
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    global _worker_doc
+    import pymupdf
+
+    _worker_doc = pymupdf.open(pdf_path)
+
+
+def _safe_name(title, limit=60):
+    name = re.sub(r'[^\w\- ]+', '', title).strip().replace(' ', '_')
+    return name[:limit] or "section"
+
+
+def plan_every(total_pages, every, selection=None):
+    # With a selection (a pagesel.PageSet) each contiguous run of selected pages
+    # is chunked on its own, so a part never bridges pages that were left out.
+    every = max(1, int(every))
+    runs = selection.ranges() if selection is not None else [(1, total_pages)]
+    ranges = []
+    for first, last in runs:
+        for start in range(first - 1, last, every):
+            end = min(start + every, last) - 1
+            name = f"page_{start + 1:03d}" if every == 1 else f"pages_{start + 1:03d}-{end + 1:03d}"
+            ranges.append((start, end, name))
+    return ranges
+
+
+def plan_bookmarks(doc, level=1):
+    starts = {}
+    for entry_level, title, page in doc.get_toc(simple=True):
+        if entry_level <= level and 1 <= page <= len(doc):
+            starts.setdefault(page - 1, title)
+    if not starts:
+        raise PDFToolkitError("PDF has no bookmarks to split on")
+
+    ordered = sorted(starts.items())
+    ranges = []
+    if ordered[0][0] > 0:
+        ranges.append((0, ordered[0][0] - 1, "000_front_matter"))
+    for index, (start, title) in enumerate(ordered):
+        end = ordered[index + 1][0] - 1 if index + 1 < len(ordered) else len(doc) - 1
+        ranges.append((start, end, f"{index + 1:03d}_{_safe_name(title)}"))
+    return ranges
+
+
+def _page_sizes(page_numbers, doc=None):
+    import pymupdf
+
+    if doc is None:
+        doc = _worker_doc
+    sizes = []
+    for page_num in page_numbers:
+        with tracing.span("split.measure", page=page_num):
+            single = pymupdf.open()
+            single.insert_pdf(doc, from_page=page_num, to_page=page_num)
+            sizes.append(len(single.tobytes(garbage=4, deflate=True)))
+            single.close()
+    return sizes
+
+
+def plan_size(pdf_path, total_pages, max_bytes, workers=1, doc=None):
+    # A page measured on its own carries its full share of fonts and images, so
+    # the sum over a chunk is an upper bound on the chunk's real size.
+    page_numbers = list(range(total_pages))
+    if workers == 1:
+        sizes = _page_sizes(page_numbers, doc=doc)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = list(chunked(page_numbers, max(1, total_pages // (workers * 4))))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+            sizes = [size for chunk_sizes in pool.map(_page_sizes, chunks) for size in chunk_sizes]
+
+    ranges = []
+    start, running = 0, 0
+    for page_num, size in enumerate(sizes):
+        if page_num > start and running + size > max_bytes:
+            ranges.append((start, page_num - 1))
+            start, running = page_num, 0
+        running += size
+    if total_pages:
+        ranges.append((start, total_pages - 1))
+    return [(a, b, f"part_{i + 1:03d}_pages_{a + 1:03d}-{b + 1:03d}") for i, (a, b) in enumerate(ranges)]
+
+
+def _write_part(start, end, output_path, doc=None):
+    import pymupdf
+
+    if doc is None:
+        doc = _worker_doc
+    with tracing.span("split.write_part", first_page=start, last_page=end):
+        part = pymupdf.open()
+        part.insert_pdf(doc, from_page=start, to_page=end)
+        # garbage=4 drops every object the copied pages do not reference and merges duplicates
+        part.save(output_path, garbage=4, deflate=True)
+        part.close()
+    return {'path': output_path, 'first_page': start + 1, 'last_page': end + 1,
+            'size': os.path.getsize(output_path)}
+
+
+def split_file(pdf_path, output_folder, mode='pages', every=1, max_size_mb=None, bookmark_level=1, workers=0,
+               pages=None, progress=None):
+    import pagesel
+    import pymupdf
+
+    progress = progress or _noop_progress
+    progress(0, "Splitting PDF...")
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown split mode: {mode} (choose from {', '.join(MODES)})")
+    if pages and mode != 'pages':
+        raise ValueError("A page selection only applies to split by pages")
+
+    with tracing.span("split.open"):
+        doc = pymupdf.open(pdf_path)
+    total_pages = len(doc)
+    workers = resolve_workers(workers, total_pages, min_jobs_per_worker=8)
+
+    with tracing.span("split.plan", mode=mode):
+        if mode == 'bookmarks':
+            ranges = plan_bookmarks(doc, bookmark_level)
+        elif mode == 'size':
+            if not max_size_mb:
+                raise ValueError("Split by size needs max_size_mb")
+            progress(0, "Measuring page sizes...")
+            ranges = plan_size(pdf_path, total_pages, max_size_mb * 1024 * 1024, workers, doc=doc)
+        else:
+            ranges = plan_every(total_pages, every, pagesel.parse_pages(pages, total_pages) if pages else None)
+
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    split_folder = os.path.join(output_folder, f"{base_name}_pages")
+    os.makedirs(split_folder, exist_ok=True)
+
+    paths = [os.path.join(split_folder, f"{name}.pdf") for _, _, name in ranges]
+    meter = Meter(progress, len(ranges), 'file')
+    parts = []
+
+    if workers == 1 or len(ranges) == 1:
+        for start, end, _ in ranges:
+            parts.append(_write_part(start, end, paths[len(parts)], doc=doc))
+            meter.update(len(parts), f"Wrote part {len(parts)}/{len(ranges)}")
+        doc.close()
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        doc.close()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+            results = pool.map(_write_part, [r[0] for r in ranges], [r[1] for r in ranges], paths,
+                               chunksize=max(1, len(ranges) // (workers * 8)))
+            for part in results:
+                parts.append(part)
+                meter.update(len(parts), f"Wrote part {len(parts)}/{len(ranges)}")
+
+    return {
+        'output': split_folder,
+        'pages': total_pages,
+        'files': [part['path'] for part in parts],
+        'parts': parts,
+        'mode': mode,
+        **meter.stats(),
+    }
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import engine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main, cli
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'import_seconds': elapsed, 'heavy_loaded': heavy}}))
+"""
+
+
+def measure(runs=5):
+    probe = PROBE.format(heavy=list(engine.HEAVY_MODULES) + [name.split('.')[0] for name in engine.HEAVY_MODULES])
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", probe], cwd=HERE, capture_output=True, text=True, check=True)
+        wall = time.perf_counter() - started
+        sample = json.loads(output.stdout.strip().splitlines()[-1])
+        sample['process_seconds'] = wall
+        samples.append(sample)
+
+    return {
+        'runs': runs,
+        'import_seconds': statistics.median(s['import_seconds'] for s in samples),
+        'process_seconds': statistics.median(s['process_seconds'] for s in samples),
+        'heavy_loaded': sorted({name for s in samples for name in s['heavy_loaded']}),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when GUI/CLI start-up imports exceed a time budget")
+    parser.add_argument("--budget", type=float, default=0.25, help="max median import time in seconds")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    result['budget_seconds'] = args.budget
+    print(json.dumps(result, indent=2))
+
+    if result['heavy_loaded']:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(result['heavy_loaded'])}", file=sys.stderr)
+        return 1
+    if result['import_seconds'] > args.budget:
+        print(f"FAIL: start-up imports took {result['import_seconds']:.3f}s (budget {args.budget:.3f}s)",
+              file=sys.stderr)
+        return 1
+    print(f"OK: start-up imports took {result['import_seconds']:.3f}s (budget {args.budget:.3f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
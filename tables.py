@@ -0,0 +1,324 @@
+import os
+
+import tracing
+from engine import PDFToolkitError, chunked, resolve_workers
+
+BACKENDS = ('pdfplumber', 'pymupdf')
+STRATEGIES = ('lines', 'text')
+
+# Coordinates closer than this (in points) count as the same line or column.
+AXIS_TOLERANCE = 1.0
+GRID_TOLERANCE = 3.0
+MIN_GRID_COLUMNS = 3
+MIN_GRID_ROWS = 3
+
+
+def _segments(item):
+    kind = item[0]
+    if kind == 'l':
+        return [(item[1][0], item[1][1], item[2][0], item[2][1])]
+    if kind == 're':
+        x0, y0, x1, y1 = item[1][0], item[1][1], item[1][2], item[1][3]
+        return [(x0, y0, x1, y0), (x0, y1, x1, y1), (x0, y0, x0, y1), (x1, y0, x1, y1)]
+    if kind == 'qu':
+        quad = item[1]
+        corners = [quad[0], quad[1], quad[3], quad[2]]
+        return [(a[0], a[1], b[0], b[1]) for a, b in zip(corners, corners[1:] + corners[:1])]
+    if kind == 'c':
+        return [(item[1][0], item[1][1], item[4][0], item[4][1])]
+    return []
+
+
+def has_ruling_lines(page):
+    # pdfplumber and pymupdf's "lines" strategy both need at least two horizontal
+    # and two vertical edges to form a single cell, so anything less cannot hold a table.
+    drawings = page.get_cdrawings() if hasattr(page, 'get_cdrawings') else page.get_drawings()
+    horizontal = vertical = 0
+    for path in drawings:
+        for item in path['items']:
+            for x0, y0, x1, y1 in _segments(item):
+                if abs(y1 - y0) <= AXIS_TOLERANCE and abs(x1 - x0) > AXIS_TOLERANCE:
+                    horizontal += 1
+                elif abs(x1 - x0) <= AXIS_TOLERANCE and abs(y1 - y0) > AXIS_TOLERANCE:
+                    vertical += 1
+                if horizontal >= 2 and vertical >= 2:
+                    return True
+    return False
+
+
+def _clusters(values, tolerance=GRID_TOLERANCE):
+    # A cluster id for each value; sorted values closer than tolerance to their
+    # neighbour share an id, so no fixed bucket boundary splits a column.
+    ids = [0] * len(values)
+    cluster, previous = -1, None
+    for index in sorted(range(len(values)), key=values.__getitem__):
+        if previous is None or values[index] - previous > tolerance:
+            cluster += 1
+        ids[index] = cluster
+        previous = values[index]
+    return ids
+
+
+def has_text_grid(page):
+    # Columns are found by shared left edges and, for right-aligned numbers, by
+    # shared right edges. A false positive only costs a full detection pass.
+    words = page.get_text("words")
+    rows = _clusters([word[3] for word in words])
+    column_rows = {}
+    for side, edge in (('left', 0), ('right', 2)):
+        for column, row in zip(_clusters([word[edge] for word in words]), rows):
+            column_rows.setdefault((side, column), set()).add(row)
+    aligned = [found for found in column_rows.values() if len(found) >= MIN_GRID_ROWS]
+    if len(aligned) < MIN_GRID_COLUMNS:
+        return False
+    shared_rows = set.intersection(*sorted(aligned, key=len, reverse=True)[:MIN_GRID_COLUMNS])
+    return len(shared_rows) >= MIN_GRID_ROWS
+
+
+def may_contain_tables(page, strategy='lines'):
+    if strategy == 'text':
+        return has_text_grid(page)
+    return has_ruling_lines(page)
+
+
+class _PageSource:
+    def __init__(self, pdf_path):
+        import pymupdf
+
+        self.pdf_path = pdf_path
+        self.doc = pymupdf.open(pdf_path)
+        self._plumber = None
+
+    def plumber(self):
+        if self._plumber is None:
+            import pdfplumber
+
+            self._plumber = pdfplumber.open(self.pdf_path)
+        return self._plumber
+
+    def close(self):
+        self.doc.close()
+        if self._plumber is not None:
+            self._plumber.close()
+
+
+def extract_page_tables(source, page_num, backend='pdfplumber', strategy='lines', prefilter=True):
+    if prefilter:
+        with tracing.span("tables.prefilter", page=page_num, strategy=strategy) as span:
+            candidate = may_contain_tables(source.doc[page_num], strategy)
+            span.set(candidate=candidate)
+        if not candidate:
+            return None
+
+    with tracing.span(f"tables.{backend}.page", page=page_num, strategy=strategy):
+        if backend == 'pymupdf':
+            found = source.doc[page_num].find_tables(strategy=strategy)
+            return [table.extract() for table in found.tables]
+
+        page = source.plumber().pages[page_num]
+        if strategy == 'text':
+            tables = page.extract_tables({"vertical_strategy": "text", "horizontal_strategy": "text"})
+        else:
+            tables = page.extract_tables()
+        if hasattr(page, 'close'):
+            page.close()
+        return tables
+
+
+_worker_source = None
+
+
+def _init_worker(pdf_path):
+    global _worker_source
+    _worker_source = _PageSource(pdf_path)
+
+
+def _extract_chunk(page_numbers, backend, strategy, prefilter):
+    return [(page_num, extract_page_tables(_worker_source, page_num, backend, strategy, prefilter))
+            for page_num in page_numbers]
+
+
+def _extract_pages(pdf_path, page_numbers, backend, strategy, prefilter, workers):
+    workers = resolve_workers(workers, len(page_numbers), min_jobs_per_worker=4)
+
+    if workers == 1:
+        source = _PageSource(pdf_path)
+        try:
+            for page_num in page_numbers:
+                yield page_num, extract_page_tables(source, page_num, backend, strategy, prefilter)
+        finally:
+            source.close()
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = list(chunked(page_numbers, max(1, min(16, len(page_numbers) // (workers * 4)))))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+        for chunk in pool.map(_extract_chunk, chunks, [backend] * len(chunks), [strategy] * len(chunks),
+                              [prefilter] * len(chunks)):
+            yield from chunk
+
+
+def iter_page_tables(pdf_path, page_numbers, backend='pdfplumber', strategy='lines', prefilter=True, workers=1,
+                     cache=None):
+    # Yields (page_num, tables, skipped) in page order; tables is a list of row lists.
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown table backend: {backend} (choose from {', '.join(BACKENDS)})")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown table strategy: {strategy} (choose from {', '.join(STRATEGIES)})")
+
+    # Pages the prefilter skipped are cached as empty, so a run without it must
+    # not reuse them.
+    params = {'backend': backend, 'strategy': strategy, 'prefilter': bool(prefilter)}
+    digest = cache.file_digest(pdf_path) if cache is not None else None
+    cached = cache.cached_pages(digest, 'tables', params) if digest else set()
+
+    missing = [page_num for page_num in page_numbers if page_num not in cached]
+    fresh = _extract_pages(pdf_path, missing, backend, strategy, prefilter, workers) if missing else iter(())
+    for page_num in page_numbers:
+        if page_num in cached:
+            yield page_num, cache.get_json(digest, page_num, 'tables', params), False
+            continue
+        fresh_num, tables = next(fresh)
+        skipped = tables is None
+        tables = tables or []
+        if digest:
+            cache.put_json(digest, fresh_num, 'tables', tables, params)
+        yield fresh_num, tables, skipped
+
+
+OUTPUT_FORMATS = ('csv', 'xlsx', 'parquet')
+PARQUET_ROW_GROUP = 65536
+
+
+def parse_formats(formats):
+    if isinstance(formats, str):
+        formats = [part.strip().lower() for part in formats.replace('+', ',').split(',') if part.strip()]
+    formats = list(dict.fromkeys(formats))
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown table output format: {', '.join(unknown) or '(none)'} "
+                         f"(choose from {', '.join(OUTPUT_FORMATS)})")
+    return formats
+
+
+def _cell(value):
+    return None if value is None else str(value)
+
+
+class CsvTableWriter:
+    def __init__(self, folder):
+        self.folder = folder
+
+    def write(self, page, table_num, df):
+        csv_file = os.path.join(self.folder, f"table_p{page}_t{table_num}.csv")
+        df.to_csv(csv_file, index=False, encoding='utf-8')
+
+    def close(self):
+        pass
+
+
+class XlsxTableWriter:
+    # openpyxl's write-only mode flushes each row to a temp file, so the workbook
+    # never holds more than the table being written.
+
+    def __init__(self, folder, name="all_tables.xlsx"):
+        from openpyxl import Workbook
+
+        self.path = os.path.join(folder, name)
+        self.workbook = Workbook(write_only=True)
+
+    def write(self, page, table_num, df):
+        sheet = self.workbook.create_sheet(title=f"Page_{page}_T{table_num}"[:31])
+        sheet.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            sheet.append([_cell(value) for value in row])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetTableWriter:
+    # One long-format dataset (page, table, row, column, value) so tables with
+    # different shapes share a schema.
+
+    def __init__(self, folder, name="tables.parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.path = os.path.join(folder, name)
+        self.schema = pa.schema([
+            ('page', pa.int32()),
+            ('table', pa.int32()),
+            ('row', pa.int32()),
+            ('column', pa.int32()),
+            ('value', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        self._reset()
+
+    def _reset(self):
+        self.columns = {name: [] for name in self.schema.names}
+
+    def write(self, page, table_num, df):
+        for row_num, row in enumerate(df.itertuples(index=False, name=None)):
+            for column, value in zip(df.columns, row):
+                self.columns['page'].append(page)
+                self.columns['table'].append(table_num)
+                self.columns['row'].append(row_num)
+                self.columns['column'].append(int(column))
+                self.columns['value'].append(_cell(value))
+        if len(self.columns['page']) >= PARQUET_ROW_GROUP:
+            self.flush()
+
+    def flush(self):
+        if self.columns['page']:
+            self.writer.write_table(self.pa.table(self.columns, schema=self.schema))
+            self._reset()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvTableWriter,
+    'xlsx': XlsxTableWriter,
+    'parquet': ParquetTableWriter,
+}
+
+
+def check_formats(formats):
+    formats = parse_formats(formats)
+    try:
+        if 'parquet' in formats:
+            import pyarrow.parquet  # noqa: F401
+        if 'xlsx' in formats:
+            import openpyxl  # noqa: F401
+    except ImportError as e:
+        raise PDFToolkitError(f"Table output {', '.join(formats)} needs {e.name} (pip install {e.name})") from e
+    return formats
+
+
+class TableSink:
+    # Writes each table to every requested format as soon as it is found; the
+    # output folder is only created once the first table turns up.
+
+    def __init__(self, folder, formats=('csv', 'xlsx')):
+        self.folder = folder
+        self.formats = check_formats(formats)
+        self.writers = None
+        self.count = 0
+
+    def write(self, page, table_num, df):
+        if self.writers is None:
+            os.makedirs(self.folder, exist_ok=True)
+            self.writers = [WRITERS[fmt](self.folder) for fmt in self.formats]
+        for writer in self.writers:
+            writer.write(page, table_num, df)
+        self.count += 1
+
+    def close(self):
+        for writer in self.writers or []:
+            writer.close()
@@ -0,0 +1,101 @@
+import tracing
+from engine import chunked, resolve_workers
+
+BACKENDS = ('pdfplumber', 'pymupdf')
+
+
+def open_document(pdf_path, backend):
+    if backend == 'pymupdf':
+        import pymupdf
+
+        return pymupdf.open(pdf_path)
+    if backend == 'pdfplumber':
+        import pdfplumber
+
+        return pdfplumber.open(pdf_path)
+    raise ValueError(f"Unknown text backend: {backend} (choose from {', '.join(BACKENDS)})")
+
+
+def document_page_count(handle, backend):
+    return len(handle) if backend == 'pymupdf' else len(handle.pages)
+
+
+def document_metadata(handle, backend):
+    metadata = handle.metadata or {}
+    if backend == 'pymupdf':
+        return {key: value for key, value in metadata.items() if value}
+    return metadata
+
+
+def page_text(handle, backend, page_num):
+    with tracing.span(f"text.{backend}.page", page=page_num):
+        if backend == 'pymupdf':
+            return handle[page_num].get_text("text", sort=True)
+
+        page = handle.pages[page_num]
+        text = page.extract_text()
+        # pdfplumber keeps parsed layout objects alive on the page; drop them so long
+        # documents stay at constant memory.
+        if hasattr(page, 'close'):
+            page.close()
+        return text
+
+
+_worker_handle = None
+_worker_backend = None
+
+
+def _init_worker(pdf_path, backend):
+    global _worker_handle, _worker_backend
+    _worker_handle = open_document(pdf_path, backend)
+    _worker_backend = backend
+
+
+def _extract_chunk(page_numbers):
+    return [(page_num, page_text(_worker_handle, _worker_backend, page_num)) for page_num in page_numbers]
+
+
+def iter_page_text(pdf_path, page_numbers, backend='pdfplumber', workers=1, handle=None, cache=None):
+    if cache is None:
+        yield from _extract_pages(pdf_path, page_numbers, backend, workers, handle)
+        return
+
+    digest = cache.file_digest(pdf_path)
+    params = {'backend': backend}
+    cached = cache.cached_pages(digest, 'text', params)
+
+    missing = [page_num for page_num in page_numbers if page_num not in cached]
+    fresh = _extract_pages(pdf_path, missing, backend, workers, handle) if missing else iter(())
+    for page_num in page_numbers:
+        if page_num in cached:
+            yield page_num, cache.get_text(digest, page_num, 'text', params)
+        else:
+            fresh_num, text = next(fresh)
+            cache.put_text(digest, fresh_num, 'text', text, params)
+            yield fresh_num, text
+
+
+def _extract_pages(pdf_path, page_numbers, backend, workers, handle):
+    workers = resolve_workers(workers, len(page_numbers), min_jobs_per_worker=8)
+
+    if workers == 1:
+        own_handle = handle is None
+        if own_handle:
+            handle = open_document(pdf_path, backend)
+        try:
+            for page_num in page_numbers:
+                yield page_num, page_text(handle, backend, page_num)
+        finally:
+            if own_handle:
+                handle.close()
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunk_size = max(1, min(64, len(page_numbers) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pdf_path, backend)) as pool:
+        # map() hands results back in submission order, so pages come out in order
+        # even though chunks finish out of order.
+        for chunk in pool.map(_extract_chunk, chunked(page_numbers, chunk_size)):
+            yield from chunk
@@ -0,0 +1,196 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Spans are off unless PDF_TOOLKIT_TRACE is set or enable() is called. When off,
+# span() returns one shared no-op object, so an instrumented stage costs a
+# global lookup and a function call.
+ENV_VAR = "PDF_TOOLKIT_TRACE"
+SPOOL_ENV_VAR = "PDF_TOOLKIT_TRACE_SPOOL"
+OWNER_ENV_VAR = "PDF_TOOLKIT_TRACE_OWNER"
+# A long GUI session keeps only the most recent spans.
+MAX_EVENTS = int(os.environ.get("PDF_TOOLKIT_TRACE_MAX_EVENTS", "1000000"))
+
+_enabled = False
+_events = collections.deque(maxlen=MAX_EVENTS)
+_spool = None
+_lock = threading.Lock()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record({
+            'name': self.name,
+            'cat': self.name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': self.start / 1000,
+            'dur': (end - self.start) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.args,
+        })
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def _record(event):
+    # Pool workers are separate processes; they append their spans to a spool
+    # file that the owning process reads back in events().
+    if str(os.getpid()) != os.environ.get(OWNER_ENV_VAR, str(os.getpid())):
+        spool = os.environ.get(SPOOL_ENV_VAR)
+        if spool:
+            with open(os.path.join(spool, f"{os.getpid()}.jsonl"), "a", encoding='utf-8') as f:
+                f.write(json.dumps(event, default=str) + "\n")
+            return
+    with _lock:
+        _events.append(event)
+
+
+def span(name, **args):
+    if not _enabled:
+        return _NOOP
+    return _Span(name, args)
+
+
+def traced(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable():
+    global _enabled, _spool
+    import multiprocessing
+
+    _enabled = True
+    # Exported so worker processes, forked or spawned, trace too; a top-level
+    # process always starts its own spool instead of inheriting a parent's.
+    os.environ[ENV_VAR] = "1"
+    if _spool is None and (multiprocessing.parent_process() is None or SPOOL_ENV_VAR not in os.environ):
+        _spool = tempfile.mkdtemp(prefix="pdf_trace_")
+        os.environ[OWNER_ENV_VAR] = str(os.getpid())
+        os.environ[SPOOL_ENV_VAR] = _spool
+        atexit.register(remove_spool)
+
+
+def remove_spool():
+    # Deletes the spool folder this process created; call it once events() has
+    # been collected.
+    global _spool
+    if _spool is None:
+        return
+    shutil.rmtree(_spool, ignore_errors=True)
+    if os.environ.get(SPOOL_ENV_VAR) == _spool:
+        os.environ.pop(SPOOL_ENV_VAR, None)
+    _spool = None
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    os.environ.pop(ENV_VAR, None)
+
+
+def is_enabled():
+    return _enabled
+
+
+def events():
+    with _lock:
+        collected = list(_events)
+    spool = os.environ.get(SPOOL_ENV_VAR)
+    if spool and os.path.isdir(spool):
+        for name in sorted(os.listdir(spool)):
+            with open(os.path.join(spool, name), encoding='utf-8') as f:
+                collected.extend(json.loads(line) for line in f if line.strip())
+    return sorted(collected, key=lambda event: event['ts'])
+
+
+def clear():
+    with _lock:
+        _events.clear()
+    spool = os.environ.get(SPOOL_ENV_VAR)
+    if spool and os.path.isdir(spool):
+        for name in os.listdir(spool):
+            os.remove(os.path.join(spool, name))
+
+
+def export_chrome(path, collected=None):
+    # Chrome's about:tracing and ui.perfetto.dev both load this format.
+    collected = events() if collected is None else collected
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump({'traceEvents': collected, 'displayTimeUnit': 'ms'}, f, default=str)
+    return path
+
+
+def summary(collected=None):
+    collected = events() if collected is None else collected
+    stages = {}
+    for event in collected:
+        stage = stages.setdefault(event['name'], {'name': event['name'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        duration = event['dur'] / 1000
+        stage['count'] += 1
+        stage['total_ms'] += duration
+        stage['max_ms'] = max(stage['max_ms'], duration)
+    for stage in stages.values():
+        stage['mean_ms'] = stage['total_ms'] / stage['count']
+    return sorted(stages.values(), key=lambda stage: stage['total_ms'], reverse=True)
+
+
+def format_summary(rows=None):
+    rows = summary() if rows is None else rows
+    lines = [f"{'stage':<28}{'count':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"]
+    for row in rows:
+        lines.append(f"{row['name']:<28}{row['count']:>8}{row['total_ms']:>12.1f}"
+                     f"{row['mean_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+if os.environ.get(ENV_VAR):
+    # PDF_TOOLKIT_TRACE=trace.json also writes the trace there when the process
+    # exits, which is how a GUI session is exported.
+    _export_path = os.environ[ENV_VAR]
+    enable()
+    if _export_path.lower().endswith('.json'):
+        atexit.register(export_chrome, _export_path)
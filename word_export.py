@@ -0,0 +1,273 @@
+import io
+from collections import Counter
+
+import tracing
+from engine import _noop_progress, chunked, resolve_workers
+from progress import Meter
+
+# Font size relative to the body size -> Word heading level
+HEADING_RATIOS = ((1.6, 1), (1.3, 2), (1.15, 3))
+MAX_HEADING_CHARS = 200
+# Pages whose font sizes are pooled to decide what the body size is
+BODY_SAMPLE_PAGES = 20
+MIN_IMAGE_POINTS = 16
+MAX_IMAGE_INCHES = 6.5
+DOCX_IMAGE_EXTS = {'png', 'jpeg', 'jpg', 'gif', 'bmp', 'tiff'}
+
+BOLD_FLAG = 16
+ITALIC_FLAG = 2
+
+
+def _runs(line_spans):
+    # Adjacent spans with the same style become one run.
+    runs = []
+    for span in line_spans:
+        text = span['text']
+        if not text:
+            continue
+        bold = bool(span['flags'] & BOLD_FLAG)
+        italic = bool(span['flags'] & ITALIC_FLAG)
+        if runs and runs[-1][1] == bold and runs[-1][2] == italic:
+            runs[-1][0] += text
+        else:
+            runs.append([text, bold, italic])
+    return runs
+
+
+def _join_lines(lines):
+    # Lines of one block are one paragraph; a trailing hyphen before a lower-case
+    # continuation is a broken word, not a dash.
+    runs = []
+    for line in lines:
+        line_runs = _runs(line)
+        if not line_runs:
+            continue
+        if runs:
+            previous = runs[-1][0]
+            if previous.endswith('-') and line_runs[0][0][:1].islower():
+                runs[-1][0] = previous[:-1]
+            elif not previous.endswith(' '):
+                runs[-1][0] = previous + ' '
+        for run in line_runs:
+            if runs and runs[-1][1:] == run[1:]:
+                runs[-1][0] += run[0]
+            else:
+                runs.append(run)
+    return runs
+
+
+def _inside(bbox, areas):
+    x0, y0, x1, y1 = bbox
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    return any(a[0] <= cx <= a[2] and a[1] <= cy <= a[3] for a in areas)
+
+
+def _image_item(block):
+    import pymupdf
+
+    x0, y0, x1, y1 = block['bbox']
+    if x1 - x0 < MIN_IMAGE_POINTS or y1 - y0 < MIN_IMAGE_POINTS:
+        return None
+    data, ext = block.get('image'), block.get('ext', '').lower()
+    if not data:
+        return None
+    if ext not in DOCX_IMAGE_EXTS:
+        pix = pymupdf.Pixmap(data)
+        if pix.alpha or pix.n not in (1, 3):
+            pix = pymupdf.Pixmap(pymupdf.csRGB, pix)
+        data = pix.tobytes("png")
+    return {'type': 'image', 'y': y0, 'x': x0, 'data': data, 'width': x1 - x0}
+
+
+def analyze_page(doc, page_num):
+    # Returns the page as plain picklable items in reading order plus a histogram
+    # of font sizes weighted by characters.
+    import tables as table_engine
+
+    page = doc[page_num]
+    items = []
+    sizes = Counter()
+
+    table_areas = []
+    with tracing.span("word.tables", page=page_num):
+        if table_engine.has_ruling_lines(page):
+            for table in page.find_tables().tables:
+                rows = [[cell if cell is not None else '' for cell in row] for row in table.extract()]
+                if rows and any(any(cell.strip() for cell in row) for row in rows):
+                    table_areas.append(tuple(table.bbox))
+                    items.append({'type': 'table', 'y': table.bbox[1], 'x': table.bbox[0], 'rows': rows})
+
+    with tracing.span("word.blocks", page=page_num):
+        layout = page.get_text("dict", sort=True)
+    for block in layout['blocks']:
+        if block['type'] == 1:
+            image = _image_item(block)
+            if image:
+                items.append(image)
+            continue
+        if _inside(block['bbox'], table_areas):
+            continue
+
+        lines = [line['spans'] for line in block['lines']]
+        runs = _join_lines(lines)
+        if not runs or not ''.join(run[0] for run in runs).strip():
+            continue
+        block_sizes = Counter()
+        for spans in lines:
+            for span in spans:
+                block_sizes[round(span['size'], 1)] += len(span['text'].strip())
+        sizes.update(block_sizes)
+        items.append({
+            'type': 'paragraph',
+            'y': block['bbox'][1],
+            'x': block['bbox'][0],
+            'runs': runs,
+            'size': block_sizes.most_common(1)[0][0] if block_sizes else 0,
+            'lines': len(lines),
+        })
+
+    items.sort(key=lambda item: (round(item['y']), item['x']))
+    return items, sizes
+
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    global _worker_doc
+    import pymupdf
+
+    _worker_doc = pymupdf.open(pdf_path)
+
+
+def _analyze_chunk(page_numbers):
+    return [(page_num, *analyze_page(_worker_doc, page_num)) for page_num in page_numbers]
+
+
+def _analyzed_pages(pdf_path, doc, page_numbers, workers):
+    if workers == 1:
+        for page_num in page_numbers:
+            yield (page_num, *analyze_page(doc, page_num))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunk_size = max(1, min(16, len(page_numbers) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as pool:
+        for chunk in pool.map(_analyze_chunk, chunked(page_numbers, chunk_size)):
+            yield from chunk
+
+
+def heading_level(item, body_size):
+    if not body_size or item['lines'] > 3:
+        return None
+    if sum(len(run[0]) for run in item['runs']) > MAX_HEADING_CHARS:
+        return None
+    ratio = item['size'] / body_size
+    for threshold, level in HEADING_RATIOS:
+        if ratio >= threshold:
+            return level
+    if ratio >= 1.0 and all(run[1] for run in item['runs'] if run[0].strip()) and item['lines'] == 1:
+        return 3
+    return None
+
+
+def _add_item(document, item, body_size):
+    # Returns what was added ('heading', 'paragraph', 'table' or 'image'), or
+    # None when the item had to be left out.
+    from docx.shared import Inches
+
+    if item['type'] == 'paragraph':
+        level = heading_level(item, body_size)
+        if level:
+            document.add_heading(''.join(run[0] for run in item['runs']).strip(), level=level)
+            return 'heading'
+        paragraph = document.add_paragraph()
+        for text, bold, italic in item['runs']:
+            run = paragraph.add_run(text)
+            run.bold = bold or None
+            run.italic = italic or None
+    elif item['type'] == 'table':
+        rows = item['rows']
+        columns = max(len(row) for row in rows)
+        table = document.add_table(rows=len(rows), cols=columns)
+        table.style = 'Table Grid'
+        for r, row in enumerate(rows):
+            cells = table.rows[r].cells
+            for c, value in enumerate(row):
+                cells[c].text = str(value)
+    elif item['type'] == 'image':
+        width = min(item['width'] / 72, MAX_IMAGE_INCHES)
+        try:
+            document.add_picture(io.BytesIO(item['data']), width=Inches(width))
+        except Exception:
+            # python-docx cannot read some colour models; a missing figure is
+            # better than a failed export.
+            return None
+    return item['type']
+
+
+def export_word(pdf_path, output_file, workers=0, page_breaks=True, progress=None):
+    from docx import Document
+    from docregistry import default_registry
+
+    progress = progress or _noop_progress
+    progress(0, "Converting PDF to Word...")
+
+    with default_registry().document(pdf_path, 'pymupdf') as doc:
+        total_pages = len(doc)
+        metadata = doc.metadata or {}
+        page_numbers = list(range(total_pages))
+        workers = resolve_workers(workers, total_pages, min_jobs_per_worker=8)
+        meter = Meter(progress, total_pages)
+
+        document = Document()
+        document.core_properties.title = metadata.get('title') or ''
+        document.core_properties.author = metadata.get('author') or ''
+
+        # Headings are relative to the body size, which needs a few pages of
+        # evidence; those pages are held back until it is known, the rest stream.
+        pending, sizes, body_size = [], Counter(), None
+        counts = {'paragraph': 0, 'table': 0, 'image': 0, 'heading': 0}
+
+        def emit(page_num, items):
+            if page_breaks and page_num > 0:
+                document.add_page_break()
+            with tracing.span("word.assemble", page=page_num):
+                for item in items:
+                    added = _add_item(document, item, body_size)
+                    if added:
+                        counts[added] += 1
+
+        done = 0
+        for page_num, items, page_sizes in _analyzed_pages(pdf_path, doc, page_numbers, workers):
+            if body_size is None:
+                pending.append((page_num, items))
+                sizes.update(page_sizes)
+                if len(pending) < BODY_SAMPLE_PAGES and len(pending) < total_pages:
+                    done += 1
+                    meter.update(done)
+                    continue
+                body_size = sizes.most_common(1)[0][0] if sizes else 0
+                for held_page, held_items in pending:
+                    emit(held_page, held_items)
+                pending = []
+            else:
+                emit(page_num, items)
+            done += 1
+            meter.update(done)
+
+    progress(100, "Writing Word document...")
+    with tracing.span("word.save"):
+        document.save(output_file)
+
+    return {
+        'output': output_file,
+        'pages': total_pages,
+        'paragraphs': counts['paragraph'],
+        'headings': counts['heading'],
+        'tables': counts['table'],
+        'images': counts['image'],
+        'workers': workers,
+        **meter.stats(),
+    }